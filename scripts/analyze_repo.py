@@ -10,10 +10,15 @@ Output:
     JSON形式で要件を出力
 """
 
+import os
 import sys
 import json
 import re
-import httpx
+
+
+# GitHub APIのエンドポイント（テスト・ベンチマーク用のスタブに差し替え可能）
+GITHUB_API_URL = os.environ.get("AP_GITHUB_API_URL", "https://api.github.com")
+GITHUB_RAW_URL = os.environ.get("AP_GITHUB_RAW_URL", "https://raw.githubusercontent.com")
 
 
 def parse_github_url(url: str) -> tuple[str, str]:
@@ -29,8 +34,25 @@ def parse_github_url(url: str) -> tuple[str, str]:
     raise ValueError(f"Invalid GitHub URL: {url}")
 
 
-def analyze(repo_url: str) -> dict:
-    """リポジトリを解析して要件を抽出"""
+def normalize_repo_url(repo_url: str) -> str:
+    """`owner/repo` 形式をGitHubのURLに正規化"""
+    if not repo_url.startswith("http"):
+        repo_url = f"https://github.com/{repo_url}"
+    return repo_url
+
+
+def analyze(repo_url: str, client=None, on_repo_info=None) -> dict:
+    """
+    リポジトリを解析して要件を抽出
+
+    client に httpx.Client を渡すと接続を使い回す（常駐サービス用）。
+    on_repo_info を渡すと、最初のAPIレスポンス（リポジトリ情報）を受け取った
+    時点で呼び出す。残りの解析を待たずに後続の準備を始めるために使う。
+    """
+    # httpxは重いので実際にAPIを呼ぶ時だけ読み込む
+    import httpx
+    from contextlib import nullcontext
+
     owner, repo_name = parse_github_url(repo_url)
 
     requirements = {
@@ -68,18 +90,21 @@ def analyze(repo_url: str) -> dict:
     ]
 
     try:
-        with httpx.Client(timeout=30.0) as client:
+        with (nullcontext(client) if client is not None else httpx.Client(timeout=30.0)) as client:
             # リポジトリ情報を取得
-            resp = client.get(f"https://api.github.com/repos/{owner}/{repo_name}")
+            resp = client.get(f"{GITHUB_API_URL}/repos/{owner}/{repo_name}")
             resp.raise_for_status()
             repo_info = resp.json()
 
             requirements["primary_language"] = (repo_info.get("language") or "unknown").lower()
             default_branch = repo_info.get("default_branch", "main")
 
+            if on_repo_info is not None:
+                on_repo_info(repo_info)
+
             # ファイルツリーを取得
             resp = client.get(
-                f"https://api.github.com/repos/{owner}/{repo_name}/git/trees/{default_branch}",
+                f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/git/trees/{default_branch}",
                 params={"recursive": "1"}
             )
             resp.raise_for_status()
@@ -106,7 +131,7 @@ def analyze(repo_url: str) -> dict:
             if requirements["has_requirements_txt"]:
                 try:
                     resp = client.get(
-                        f"https://raw.githubusercontent.com/{owner}/{repo_name}/{default_branch}/requirements.txt"
+                        f"{GITHUB_RAW_URL}/{owner}/{repo_name}/{default_branch}/requirements.txt"
                     )
                     content = resp.text.lower()
 
@@ -154,11 +179,8 @@ def main():
         print("Usage: python analyze_repo.py <github-url>", file=sys.stderr)
         sys.exit(1)
 
-    repo_url = sys.argv[1]
-
     # URLの正規化
-    if not repo_url.startswith("http"):
-        repo_url = f"https://github.com/{repo_url}"
+    repo_url = normalize_repo_url(sys.argv[1])
 
     result = analyze(repo_url)
     print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Benchmark - ナレッジベース・解析・プロビジョニングの性能計測
+
+Usage:
+    python scripts/benchmark.py
+    python scripts/benchmark.py --sizes 1000,10000 --repeat 5 --output bench.json
+    python scripts/benchmark.py --compare bench.json --threshold 1.2
+
+Note:
+    実データ・ネットワーク・Dockerには一切触れない。
+    - ナレッジベース: シードのACE-Step記録を元に合成した一時ディレクトリ
+    - analyze(): ローカルで起動したGitHub APIスタブ
+    - provision_docker_local(): PATHに差し込んだ `git` / `docker` のシム
+    結果はJSONで出力し、--compare で前回の結果と比較できる。
+    計測した呼び出しの戻り値も検証し、期待した結果でなければ
+    そのベンチマークを "failed" として終了コード1にする。
+"""
+
+import os
+import sys
+import json
+import copy
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import knowledge
+import price_history
+
+
+SEED_DIR = SCRIPTS_DIR.parent / "assets" / "knowledge" / "seed"
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 5
+
+# 前回比でこの倍率を超えて遅くなったら回帰とみなす
+DEFAULT_THRESHOLD = 1.2
+
+# 合成レコードの要件に混ぜるバリエーション
+LANGUAGES = ["python", "python", "python", "javascript", "go", "rust"]
+FRAMEWORKS = ["pytorch", "transformers", "diffusers", "tensorflow", "jax", "vllm", "langchain"]
+PROVIDERS = ["vast.ai", "runpod", "docker-local", "hetzner"]
+
+
+# ---------------------------------------------------------------------------
+# 計測ユーティリティ
+# ---------------------------------------------------------------------------
+
+def time_call(fn, repeat: int, setup=None, check=None) -> dict:
+    """
+    関数を repeat 回実行して所要時間（ミリ秒）を集計
+
+    check は戻り値を受け取り、問題があればその内容（文字列）を返す。
+    失敗した実行があれば計測値の代わりに {"failed": ...} を返す
+    （失敗して早く終わった実行を速くなったと誤認しないため）。
+    """
+    samples = []
+    for i in range(repeat):
+        args = setup(i) if setup else ()
+        start = time.perf_counter()
+        value = fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+        problem = check(value) if check else None
+        if problem:
+            return {"failed": problem, "run": i + 1}
+    return {
+        "runs": repeat,
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 合成ナレッジベース
+# ---------------------------------------------------------------------------
+
+def load_seed_records() -> list[dict]:
+    """シードのレコードを雛形として読み込む"""
+    return [
+        json.loads(path.read_text())
+        for path in sorted(SEED_DIR.glob("*.json"))
+        if path.name != "index.json"
+    ]
+
+
+def generate_knowledge_base(target: Path, size: int, seed: int = 0) -> list[str]:
+    """
+    シードと同じ形の合成レコードを size 件生成
+
+    1リポジトリあたり平均4件（失敗3件 + 成功1件のACE-Stepの履歴と同じ比率）。
+    生成したリポジトリURLの一覧を返す。
+    """
+    rng = random.Random(seed)
+    templates = load_seed_records()
+    target.mkdir(parents=True, exist_ok=True)
+
+    index = {"records": {}, "repo_mapping": {}}
+    repo_urls = []
+    base_time = datetime(2026, 1, 1)
+
+    repo_count = max(1, size // 4)
+    for n in range(size):
+        repo_url = f"https://github.com/bench-{n % repo_count}/project-{n % repo_count}"
+        if n < repo_count:
+            repo_urls.append(repo_url)
+
+        template = templates[n % len(templates)]
+        created_at = base_time + timedelta(seconds=n)
+        key = knowledge.repo_key(repo_url)
+        record_id = f"{key}_{created_at.strftime('%Y%m%d_%H%M%S')}_{n}"
+
+        record = copy.deepcopy(template)
+        record.update({
+            "id": record_id,
+            "repo_url": repo_url,
+            "created_at": created_at.isoformat(),
+            "provider_used": rng.choice(PROVIDERS),
+            "success": template.get("success", False) or rng.random() < 0.25,
+        })
+        requirements = record.setdefault("requirements", {})
+        requirements.update({
+            "repo_url": repo_url,
+            "primary_language": rng.choice(LANGUAGES),
+            "needs_gpu": rng.random() < 0.6,
+            "has_dockerfile": rng.random() < 0.3,
+            "frameworks": rng.sample(FRAMEWORKS, rng.randint(0, 3)),
+        })
+
+        (target / f"{record_id}.json").write_text(json.dumps(record, indent=2, default=str))
+        index["repo_mapping"].setdefault(key, []).append(record_id)
+        index["records"][record_id] = {
+            "repo_url": repo_url,
+            "provider": record["provider_used"],
+            "success": record["success"],
+            "created_at": record["created_at"],
+        }
+
+    (target / "index.json").write_text(json.dumps(index, indent=2, default=str))
+    return repo_urls
+
+
+def use_knowledge_dir(path: Path):
+    """knowledge / price_history の保存先を一時ディレクトリに切り替える"""
+    knowledge.KNOWLEDGE_DIR = path
+    price_history.PRICE_HISTORY_FILE = path / "price_history.bin"
+    price_history.PRICE_NAMES_FILE = path / "price_history_names.json"
+
+
+def bench_knowledge(size: int, repeat: int, workdir: Path) -> dict:
+    """合成ナレッジベースに対して knowledge.py の各操作を計測"""
+    kb_dir = workdir / f"kb-{size}"
+    repo_urls = generate_knowledge_base(kb_dir, size)
+    use_knowledge_dir(kb_dir)
+
+    query = {
+        "primary_language": "python",
+        "needs_gpu": True,
+        "has_dockerfile": False,
+        "frameworks": ["pytorch", "transformers", "diffusers"],
+    }
+    result_template = load_seed_records()[-1]
+
+    results = {
+        "get_last_success": time_call(
+            knowledge.get_last_success, repeat,
+            setup=lambda i: (repo_urls[(i * 7919) % len(repo_urls)],),
+        ),
+        "find_similar": time_call(knowledge.find_similar, repeat, setup=lambda i: (query,)),
+        "list_records": time_call(knowledge.list_records, repeat),
+        "save_record": time_call(
+            knowledge.save_record, repeat,
+            setup=lambda i: (f"https://github.com/bench-new/project-{size}-{i}", result_template),
+        ),
+    }
+    shutil.rmtree(kb_dir, ignore_errors=True)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# GitHub APIスタブ
+# ---------------------------------------------------------------------------
+
+STUB_TREE = [
+    "README.md", "requirements.txt", "main.py", "Dockerfile",
+    *[f"src/module_{i}.py" for i in range(200)],
+]
+STUB_REQUIREMENTS = "torch>=2.0\ntransformers\ndiffusers\naccelerate\nnumpy\n"
+
+
+class GitHubStubHandler(BaseHTTPRequestHandler):
+    """analyze() が呼ぶ3種類のエンドポイントだけを返すスタブ"""
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.endswith("/requirements.txt"):
+            self._send(STUB_REQUIREMENTS.encode(), "text/plain")
+        elif "/git/trees/" in path:
+            tree = [{"path": p, "type": "blob"} for p in STUB_TREE]
+            self._send(json.dumps({"tree": tree}).encode(), "application/json")
+        elif path.startswith("/repos/"):
+            info = {"language": "Python", "default_branch": "main"}
+            self._send(json.dumps(info).encode(), "application/json")
+        else:
+            self.send_error(404)
+
+    def _send(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def check_analysis(requirements: dict) -> str | None:
+    """スタブの内容（Python + torch）を解析できているか"""
+    errors = [note for note in requirements.get("analysis_notes", []) if note.startswith("Error:")]
+    if errors:
+        return errors[0]
+    if requirements.get("confidence_score", 0) <= 0.1:
+        return f"confidence_score too low: {requirements.get('confidence_score')}"
+    if requirements.get("primary_language") != "python" or not requirements.get("needs_gpu"):
+        return "stub repository was not analyzed as a Python GPU project"
+    return None
+
+
+def bench_analyze(repeat: int) -> dict:
+    """ローカルのGitHubスタブに対して analyze() を計測"""
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        return {"skipped": "httpx is not installed"}
+
+    import analyze_repo
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GitHubStubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    saved = analyze_repo.GITHUB_API_URL, analyze_repo.GITHUB_RAW_URL
+    analyze_repo.GITHUB_API_URL, analyze_repo.GITHUB_RAW_URL = base, base
+    try:
+        return time_call(
+            analyze_repo.analyze, repeat,
+            setup=lambda i: ("https://github.com/bench/stub",),
+            check=check_analysis,
+        )
+    finally:
+        analyze_repo.GITHUB_API_URL, analyze_repo.GITHUB_RAW_URL = saved
+        server.shutdown()
+        server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# git / docker シム
+# ---------------------------------------------------------------------------
+
+GIT_SHIM = """#!/bin/sh
+# git clone ... <dest> を模擬: 最後の引数のディレクトリにファイルを作る
+for last; do :; done
+if [ "$1" = "clone" ]; then
+    mkdir -p "$last/src" "$last/.git"
+    echo "print('hello')" > "$last/main.py"
+    echo "numpy" > "$last/requirements.txt"
+    i=0
+    while [ $i -lt 50 ]; do
+        echo "x = $i" > "$last/src/module_$i.py"
+        i=$((i + 1))
+    done
+fi
+exit 0
+"""
+
+DOCKER_SHIM = """#!/bin/sh
+# docker build / run を模擬: run はコンテナIDを返す
+if [ "$1" = "run" ]; then
+    echo "0123456789abcdef0123456789abcdef"
+fi
+exit 0
+"""
+
+
+def check_provision(result: dict) -> str | None:
+    """シム上でコンテナ起動まで到達したか"""
+    if result.get("status") != "running":
+        errors = result.get("errors") or []
+        return f"status {result.get('status')!r}" + (f": {errors[0]}" if errors else "")
+    return None
+
+
+def bench_provision(repeat: int, workdir: Path) -> dict:
+    """PATH上の git / docker シムで provision_docker_local() を計測"""
+    if os.name == "nt":
+        return {"skipped": "shell shims are not supported on Windows"}
+
+    import provision
+
+    bin_dir = workdir / "shim-bin"
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for name, content in [("git", GIT_SHIM), ("docker", DOCKER_SHIM)]:
+        shim = bin_dir / name
+        shim.write_text(content)
+        shim.chmod(0o755)
+
+    requirements = {
+        "repo_name": "stub",
+        "primary_language": "python",
+        "needs_gpu": False,
+        "entry_point": "main.py",
+        "ports": [8000],
+    }
+
+    saved_path = os.environ.get("PATH", "")
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{saved_path}"
+    try:
+        return time_call(
+            provision.provision_docker_local, repeat,
+            setup=lambda i: ("https://github.com/bench/stub", requirements),
+            check=check_provision,
+        )
+    finally:
+        os.environ["PATH"] = saved_path
+
+
+# ---------------------------------------------------------------------------
+# 実行・比較
+# ---------------------------------------------------------------------------
+
+def run_benchmarks(sizes: list[int], repeat: int) -> dict:
+    """全ベンチマークを実行して結果をまとめる"""
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+        },
+        "results": {},
+    }
+
+    saved_dirs = knowledge.KNOWLEDGE_DIR, price_history.PRICE_HISTORY_FILE, price_history.PRICE_NAMES_FILE
+    workdir = Path(tempfile.mkdtemp(prefix="ap-bench-"))
+    try:
+        for size in sizes:
+            for name, stats in bench_knowledge(size, repeat, workdir).items():
+                report["results"][f"knowledge.{name}[{size}]"] = stats
+
+        report["results"]["analyze_repo.analyze[stub]"] = bench_analyze(repeat)
+        report["results"]["provision.provision_docker_local[shim]"] = bench_provision(repeat, workdir)
+    finally:
+        knowledge.KNOWLEDGE_DIR, price_history.PRICE_HISTORY_FILE, price_history.PRICE_NAMES_FILE = saved_dirs
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> dict:
+    """前回の結果と中央値を比較して回帰を検出"""
+    comparison = {"threshold": threshold, "benchmarks": {}, "regressions": []}
+
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_ms" not in base or "median_ms" not in stats:
+            continue
+        ratio = stats["median_ms"] / base["median_ms"] if base["median_ms"] else None
+        comparison["benchmarks"][name] = {
+            "baseline_median_ms": base["median_ms"],
+            "current_median_ms": stats["median_ms"],
+            "ratio": round(ratio, 3) if ratio is not None else None,
+        }
+        if ratio is not None and ratio > threshold:
+            comparison["regressions"].append(name)
+
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark knowledge base, analysis and provisioning")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated synthetic knowledge base sizes")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per benchmark")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown ratio treated as a regression")
+
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = run_benchmarks(sizes, args.repeat)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        report["comparison"] = compare(report, baseline, args.threshold)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+    failed = [name for name, stats in report["results"].items() if "failed" in stats]
+    if failed or report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Startup Check - スクリプトの起動時間（import時間）を予算と比較
+
+Usage:
+    python scripts/check_startup.py
+    python scripts/check_startup.py --budget-ms 80
+    python scripts/check_startup.py --module provision --module knowledge
+
+Output:
+    JSON形式でモジュールごとのimport時間を出力。
+    予算超過、または重い依存が起動時に読み込まれた場合は終了コード1。
+"""
+
+import sys
+import json
+import subprocess
+import argparse
+from pathlib import Path
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# CLI・エージェントから直接呼ばれるモジュール
+DEFAULT_MODULES = ["analyze_repo", "knowledge", "provision", "search_better"]
+
+# 起動時に読み込んではいけない重い依存（使う関数の中で遅延importする）
+LAZY_ONLY = ["httpx"]
+
+# モジュール1つあたりのimport時間の予算（ミリ秒）
+DEFAULT_BUDGET_MS = 50.0
+
+
+def measure_import(module: str) -> dict:
+    """`python -X importtime` でモジュールのimport時間を計測"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=SCRIPTS_DIR,
+    )
+
+    result = {
+        "module": module,
+        "cumulative_ms": None,
+        "imported": [],
+        "error": None,
+    }
+
+    if proc.returncode != 0:
+        result["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+        return result
+
+    # 形式: "import time: self [us] | cumulative | imported package"
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        result["imported"].append(name)
+        if name == module:
+            result["cumulative_ms"] = int(cumulative) / 1000
+
+    return result
+
+
+def check(modules: list[str], budget_ms: float) -> dict:
+    """各モジュールを計測して予算と比較"""
+    report = {"budget_ms": budget_ms, "modules": [], "ok": True}
+
+    for module in modules:
+        measured = measure_import(module)
+        eager = [
+            name for name in measured["imported"]
+            if name.split(".")[0] in LAZY_ONLY
+        ]
+        entry = {
+            "module": module,
+            "cumulative_ms": measured["cumulative_ms"],
+            "eager_heavy_imports": sorted({name.split(".")[0] for name in eager}),
+            "ok": True,
+        }
+        if measured["error"]:
+            entry["error"] = measured["error"]
+            entry["ok"] = False
+        elif measured["cumulative_ms"] is None or measured["cumulative_ms"] > budget_ms:
+            entry["ok"] = False
+        if entry["eager_heavy_imports"]:
+            entry["ok"] = False
+
+        report["modules"].append(entry)
+        report["ok"] = report["ok"] and entry["ok"]
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check script start-up time against a budget")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Import time budget per module in milliseconds")
+    parser.add_argument("--module", action="append", help="Module to check (repeatable)")
+
+    args = parser.parse_args()
+
+    report = check(args.module or DEFAULT_MODULES, args.budget_ms)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
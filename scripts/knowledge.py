@@ -12,6 +12,7 @@ Usage:
 import sys
 import json
 import hashlib
+import threading
 from datetime import datetime
 from pathlib import Path
 import argparse
@@ -20,6 +21,36 @@ import argparse
 # ナレッジベースのストレージパス
 KNOWLEDGE_DIR = Path(__file__).parent.parent / "assets" / "knowledge"
 
+# 常駐プロセス用のメモリキャッシュ（enable_cache() で有効化）
+_cache_enabled = False
+_index_cache: dict | None = None
+# キャッシュした時点の index.json の (mtime_ns, size)。他プロセスの書き込み検出用
+_index_stamp: tuple[int, int] | None = None
+_record_cache: dict[str, dict] = {}
+# インデックスの読み込み→更新→保存を直列化する
+_index_lock = threading.RLock()
+
+
+def enable_cache():
+    """
+    インデックスと記録をメモリに保持する（常駐サービス用）
+
+    書き込みはライトスルーでファイルにも反映される。CLIなど他のプロセスが
+    index.json を更新した場合は、更新日時・サイズの変化を検出して読み直す。
+    CLIのように1回で終了するプロセスでは有効化する必要はない。
+    """
+    global _cache_enabled
+    _cache_enabled = True
+
+
+def clear_cache():
+    """メモリキャッシュを破棄して次回ファイルから読み直す"""
+    global _index_cache, _index_stamp
+    with _index_lock:
+        _index_cache = None
+        _index_stamp = None
+        _record_cache.clear()
+
 
 def ensure_dir():
     """ストレージディレクトリを確保"""
@@ -29,15 +60,53 @@ def ensure_dir():
         index_file.write_text(json.dumps({"records": {}, "repo_mapping": {}}, indent=2))
 
 
+def index_stamp() -> tuple[int, int] | None:
+    """index.json の (mtime_ns, size)。存在しなければ None"""
+    try:
+        stat = (KNOWLEDGE_DIR / "index.json").stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
 def load_index() -> dict:
-    """インデックスを読み込む"""
-    ensure_dir()
-    return json.loads((KNOWLEDGE_DIR / "index.json").read_text())
+    """インデックスを読み込む（キャッシュはファイルが変わっていなければ再利用）"""
+    global _index_cache, _index_stamp
+    with _index_lock:
+        stamp = index_stamp()
+        if _cache_enabled and _index_cache is not None and stamp == _index_stamp:
+            return _index_cache
+        ensure_dir()
+        # 読み込む前の時点の stamp を保持し、読み込み中の更新は次回検出させる
+        stamp = stamp or index_stamp()
+        index = json.loads((KNOWLEDGE_DIR / "index.json").read_text())
+        if _cache_enabled:
+            _index_cache = index
+            _index_stamp = stamp
+        return index
 
 
 def save_index(index: dict):
     """インデックスを保存"""
-    (KNOWLEDGE_DIR / "index.json").write_text(json.dumps(index, indent=2, default=str))
+    global _index_cache, _index_stamp
+    with _index_lock:
+        (KNOWLEDGE_DIR / "index.json").write_text(json.dumps(index, indent=2, default=str))
+        if _cache_enabled:
+            _index_cache = index
+            _index_stamp = index_stamp()
+
+
+def load_record(record_id: str) -> dict | None:
+    """個別の記録を読み込む（記録は保存後に変更されないのでキャッシュできる）"""
+    if _cache_enabled and record_id in _record_cache:
+        return _record_cache[record_id]
+    record_file = KNOWLEDGE_DIR / f"{record_id}.json"
+    if not record_file.exists():
+        return None
+    record = json.loads(record_file.read_text())
+    if _cache_enabled:
+        _record_cache[record_id] = record
+    return record
 
 
 def repo_key(repo_url: str) -> str:
@@ -55,9 +124,9 @@ def get_last_success(repo_url: str) -> dict | None:
     for record_id in reversed(record_ids):
         record_info = index["records"].get(record_id, {})
         if record_info.get("success", False):
-            record_file = KNOWLEDGE_DIR / f"{record_id}.json"
-            if record_file.exists():
-                return json.loads(record_file.read_text())
+            record = load_record(record_id)
+            if record is not None:
+                return record
 
     return None
 
@@ -65,33 +134,45 @@ def get_last_success(repo_url: str) -> dict | None:
 def save_record(repo_url: str, result: dict) -> str:
     """成功した手順を保存"""
     ensure_dir()
-    index = load_index()
-    key = repo_key(repo_url)
-    record_id = f"{key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-    # レコードを作成
-    record = {
-        "id": record_id,
-        "repo_url": repo_url,
-        "created_at": datetime.now().isoformat(),
-        **result,
-    }
-
-    # ファイルに保存
-    record_file = KNOWLEDGE_DIR / f"{record_id}.json"
-    record_file.write_text(json.dumps(record, indent=2, default=str))
-
-    # インデックスを更新
-    if key not in index["repo_mapping"]:
-        index["repo_mapping"][key] = []
-    index["repo_mapping"][key].append(record_id)
-    index["records"][record_id] = {
-        "repo_url": repo_url,
-        "provider": result.get("provider_used", "unknown"),
-        "success": result.get("success", True),
-        "created_at": record["created_at"],
-    }
-    save_index(index)
+    with _index_lock:
+        index = load_index()
+        key = repo_key(repo_url)
+        record_id = f"{key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        # レコードを作成
+        record = {
+            "id": record_id,
+            "repo_url": repo_url,
+            "created_at": datetime.now().isoformat(),
+            **result,
+        }
+
+        # ファイルに保存
+        record_file = KNOWLEDGE_DIR / f"{record_id}.json"
+        record_file.write_text(json.dumps(record, indent=2, default=str))
+        if _cache_enabled:
+            _record_cache[record_id] = json.loads(json.dumps(record, default=str))
+
+        # インデックスを更新
+        if key not in index["repo_mapping"]:
+            index["repo_mapping"][key] = []
+        index["repo_mapping"][key].append(record_id)
+        index["records"][record_id] = {
+            "repo_url": repo_url,
+            "provider": result.get("provider_used", "unknown"),
+            "success": result.get("success", True),
+            "created_at": record["created_at"],
+        }
+        save_index(index)
+
+    # 実際に使ったインスタンスの価格を価格履歴にも残す
+    # （"$0.15" のような文字列も受け付け、数値にできない価格やIDだけの instance は記録しない）
+    instance = result.get("instance")
+    if result.get("success", True) and isinstance(instance, dict):
+        from price_history import PriceHistory, parse_price
+        price = parse_price(instance.get("cost_per_hour"))
+        if price is not None:
+            PriceHistory().add(result.get("provider_used", "unknown"), instance.get("gpu", ""), price)
 
     return record_id
 
@@ -101,7 +182,7 @@ def list_records() -> list[dict]:
     index = load_index()
     return [
         {"id": rid, **info}
-        for rid, info in index["records"].items()
+        for rid, info in list(index["records"].items())
     ]
 
 
@@ -110,15 +191,14 @@ def find_similar(requirements: dict) -> list[dict]:
     index = load_index()
     similar = []
 
-    for record_id, record_info in index["records"].items():
+    for record_id, record_info in list(index["records"].items()):
         if not record_info.get("success", False):
             continue
 
-        record_file = KNOWLEDGE_DIR / f"{record_id}.json"
-        if not record_file.exists():
+        record = load_record(record_id)
+        if record is None:
             continue
 
-        record = json.loads(record_file.read_text())
         record_req = record.get("requirements", {})
 
         # 類似度を計算
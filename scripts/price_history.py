@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Price History - プロバイダー・GPUごとの価格推移を記録
+
+Usage:
+    python scripts/price_history.py add --provider vast.ai --gpu "RTX 3060" --price 0.06
+    python scripts/price_history.py add --provider hetzner --gpu "" --price 4.51 --per-month
+    python scripts/price_history.py stats --gpu "RTX 3060" [--provider vast.ai] [--days 30]
+    python scripts/price_history.py assess --gpu "RTX 3060" --price 0.06 [--days 30]
+
+Storage:
+    観測値は追記専用のバイナリファイルに固定長レコードで保存する。
+    プロバイダー名・GPU名・出典URLは文字列テーブルに登録して整数IDで参照する。
+    同じ (プロバイダー, GPU, 出典, 日付, 価格) の観測は1日1回だけ記録する。
+"""
+
+import re
+import json
+import struct
+import argparse
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+# 価格履歴の保存先（ナレッジベースと同じディレクトリ）
+PRICE_HISTORY_FILE = Path(__file__).parent.parent / "assets" / "knowledge" / "price_history.bin"
+PRICE_NAMES_FILE = Path(__file__).parent.parent / "assets" / "knowledge" / "price_history_names.json"
+
+# 1レコード: タイムスタンプ(UNIX秒), プロバイダーID, GPU ID, 出典ID, 時間単価($/hour)
+RECORD = struct.Struct("<dIIId")
+
+# 月額料金を時間単価に換算する際の1ヶ月あたりの時間
+HOURS_PER_MONTH = 730
+
+DEFAULT_WINDOW_DAYS = 30
+
+# トレンドを計算するのに必要な観測期間（日）
+MIN_TREND_SPAN_DAYS = 1
+
+
+def parse_price(value) -> float | None:
+    """`0.2`, `"$0.20"`, `"0.20/hr"` などから数値を取り出す"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(r"\d+(?:\.\d+)?", value.replace(",", ""))
+        if match:
+            return float(match.group())
+    return None
+
+
+def normalize_provider(name: str) -> str:
+    """プロバイダー名の表記揺れを吸収"""
+    return " ".join(str(name or "").lower().split())
+
+
+def normalize_gpu(name: str) -> str:
+    """GPU名の表記揺れを吸収（"NVIDIA GeForce RTX 3060" → "rtx 3060"）"""
+    words = str(name or "").lower().replace("_", " ").split()
+    return " ".join(w for w in words if w not in ("nvidia", "geforce"))
+
+
+class PriceHistory:
+    """列指向（array）で保持する追記専用の価格観測ストア"""
+
+    def __init__(self, path: Path | None = None, names_path: Path | None = None):
+        self.path = path or PRICE_HISTORY_FILE
+        self.names_path = names_path or PRICE_NAMES_FILE
+        self.timestamps = array("d")
+        self.provider_ids = array("I")
+        self.gpu_ids = array("I")
+        self.source_ids = array("I")
+        self.prices = array("d")
+        self.providers: list[str] = []
+        self.gpus: list[str] = []
+        self.sources: list[str] = []
+        self._provider_index: dict[str, int] = {}
+        self._gpu_index: dict[str, int] = {}
+        self._source_index: dict[str, int] = {}
+        # 重複判定用の (プロバイダーID, GPU ID, 出典ID, 日付, 価格)
+        self._seen: set[tuple[int, int, int, int, float]] = set()
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def load(self):
+        """文字列テーブルと観測値を読み込む"""
+        if self.names_path.exists():
+            names = json.loads(self.names_path.read_text())
+            self.providers = names.get("providers", [])
+            self.gpus = names.get("gpus", [])
+            self.sources = names.get("sources", [])
+        self._provider_index = {name: i for i, name in enumerate(self.providers)}
+        self._gpu_index = {name: i for i, name in enumerate(self.gpus)}
+        self._source_index = {name: i for i, name in enumerate(self.sources)}
+
+        if not self.path.exists():
+            return
+        data = self.path.read_bytes()
+        # 書き込み途中で切れた末尾のレコードは無視する
+        usable = len(data) - len(data) % RECORD.size
+        for ts, provider_id, gpu_id, source_id, price in RECORD.iter_unpack(data[:usable]):
+            self.timestamps.append(ts)
+            self.provider_ids.append(provider_id)
+            self.gpu_ids.append(gpu_id)
+            self.source_ids.append(source_id)
+            self.prices.append(price)
+            self._seen.add(observation_key(provider_id, gpu_id, source_id, ts, price))
+
+    def _intern(self, name: str, table: list[str], index: dict[str, int]) -> tuple[int, bool]:
+        """文字列をIDに変換（未登録なら登録）"""
+        if name in index:
+            return index[name], False
+        index[name] = len(table)
+        table.append(name)
+        return index[name], True
+
+    def add_many(self, observations) -> int:
+        """
+        (provider, gpu, price_per_hour[, timestamp[, source_url]]) の列をまとめて追記
+
+        ファイルは1回だけ開く。同じ日に同じ出典から同じ価格を観測済みなら
+        記録しない（同じ検索結果を再解析しても履歴が水増しされない）。
+        戻り値は追記した件数。
+        """
+        rows = bytearray()
+        names_changed = False
+        count = 0
+
+        for observation in observations:
+            provider, gpu, price = observation[:3]
+            ts = observation[3] if len(observation) > 3 and observation[3] is not None else datetime.now().timestamp()
+            source = str(observation[4] or "").strip() if len(observation) > 4 else ""
+            price = parse_price(price)
+            if price is None:
+                continue
+
+            provider_id, added = self._intern(normalize_provider(provider), self.providers, self._provider_index)
+            names_changed = names_changed or added
+            gpu_id, added = self._intern(normalize_gpu(gpu), self.gpus, self._gpu_index)
+            names_changed = names_changed or added
+            source_id, added = self._intern(source, self.sources, self._source_index)
+            names_changed = names_changed or added
+
+            key = observation_key(provider_id, gpu_id, source_id, ts, price)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+
+            self.timestamps.append(ts)
+            self.provider_ids.append(provider_id)
+            self.gpu_ids.append(gpu_id)
+            self.source_ids.append(source_id)
+            self.prices.append(price)
+            rows += RECORD.pack(ts, provider_id, gpu_id, source_id, price)
+            count += 1
+
+        if count:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 文字列テーブルを先に書き、レコードが未登録IDを参照しないようにする
+            if names_changed:
+                self.names_path.write_text(
+                    json.dumps(
+                        {"providers": self.providers, "gpus": self.gpus, "sources": self.sources},
+                        indent=2,
+                        ensure_ascii=False,
+                    )
+                )
+            with open(self.path, "ab") as f:
+                f.write(rows)
+
+        return count
+
+    def add(
+        self,
+        provider: str,
+        gpu: str,
+        price_per_hour: float,
+        timestamp: float | None = None,
+        source: str = "",
+    ) -> bool:
+        """観測値を1件追記（重複・不正な価格で記録しなかった場合は False）"""
+        return self.add_many([(provider, gpu, price_per_hour, timestamp, source)]) == 1
+
+    def select(
+        self,
+        gpu: str | None = None,
+        provider: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> list[tuple[float, float]]:
+        """条件に合う (timestamp, price) を時刻順に返す"""
+        gpu_id = self._gpu_index.get(normalize_gpu(gpu)) if gpu is not None else None
+        provider_id = self._provider_index.get(normalize_provider(provider)) if provider is not None else None
+        if (gpu is not None and gpu_id is None) or (provider is not None and provider_id is None):
+            return []
+
+        start = since.timestamp() if since else float("-inf")
+        end = until.timestamp() if until else float("inf")
+
+        rows = [
+            (self.timestamps[i], self.prices[i])
+            for i in range(len(self.prices))
+            if start <= self.timestamps[i] <= end
+            and (gpu_id is None or self.gpu_ids[i] == gpu_id)
+            and (provider_id is None or self.provider_ids[i] == provider_id)
+        ]
+        rows.sort()
+        return rows
+
+    def stats(
+        self,
+        gpu: str | None = None,
+        provider: str | None = None,
+        window_days: float = DEFAULT_WINDOW_DAYS,
+        now: datetime | None = None,
+    ) -> dict:
+        """期間内の最安値・中央値・トレンドを集計"""
+        now = now or datetime.now()
+        rows = self.select(gpu, provider, since=now - timedelta(days=window_days), until=now)
+        result = {
+            "gpu": gpu,
+            "provider": provider,
+            "window_days": window_days,
+            "count": len(rows),
+            "min": None,
+            "median": None,
+            "max": None,
+            "latest": None,
+            "trend_per_day": None,
+            "trend": "unknown",
+        }
+        if not rows:
+            return result
+
+        prices = sorted(price for _, price in rows)
+        mid = len(prices) // 2
+        median = prices[mid] if len(prices) % 2 else (prices[mid - 1] + prices[mid]) / 2
+
+        result.update({
+            "min": prices[0],
+            "median": median,
+            "max": prices[-1],
+            "latest": rows[-1][1],
+        })
+
+        slope = trend_per_day(rows)
+        if slope is not None:
+            result["trend_per_day"] = slope
+            # 期間全体で中央値の5%以上動いていればトレンドありとみなす
+            change = slope * window_days
+            if median and abs(change) >= median * 0.05:
+                result["trend"] = "falling" if change < 0 else "rising"
+            else:
+                result["trend"] = "flat"
+
+        return result
+
+    def assess(
+        self,
+        price_per_hour: float,
+        gpu: str,
+        provider: str | None = None,
+        window_days: float = DEFAULT_WINDOW_DAYS,
+        now: datetime | None = None,
+    ) -> dict:
+        """価格が過去の観測値と比べて妥当かを判定"""
+        stats = self.stats(gpu, provider, window_days, now)
+        result = {"price_per_hour": price_per_hour, "verdict": "unknown", "percentile": None, "stats": stats}
+        if not stats["count"]:
+            return result
+
+        now = now or datetime.now()
+        prices = [p for _, p in self.select(gpu, provider, since=now - timedelta(days=window_days), until=now)]
+        percentile = sum(1 for p in prices if p < price_per_hour) / len(prices)
+        result["percentile"] = round(percentile, 3)
+
+        if price_per_hour <= stats["min"] or percentile <= 0.25:
+            result["verdict"] = "good"
+        elif price_per_hour <= stats["median"]:
+            result["verdict"] = "fair"
+        else:
+            result["verdict"] = "high"
+        return result
+
+
+def observation_key(provider_id: int, gpu_id: int, source_id: int, ts: float, price: float) -> tuple:
+    """重複判定キー（UTCの日付単位）"""
+    return provider_id, gpu_id, source_id, int(ts // 86400), round(price, 6)
+
+
+def trend_per_day(rows: list[tuple[float, float]]) -> float | None:
+    """最小二乗法による価格の傾き（$/hour per day）"""
+    if len(rows) < 2:
+        return None
+    days = [ts / 86400 for ts, _ in rows]
+    if max(days) - min(days) < MIN_TREND_SPAN_DAYS:
+        return None
+    prices = [price for _, price in rows]
+    mean_x = sum(days) / len(days)
+    mean_y = sum(prices) / len(prices)
+    var_x = sum((x - mean_x) ** 2 for x in days)
+    if var_x == 0:
+        return None
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(days, prices))
+    return cov / var_x
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price history of providers and GPU models")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # add コマンド
+    add_parser = subparsers.add_parser("add", help="Record a price observation")
+    add_parser.add_argument("--provider", required=True, help="Provider name")
+    add_parser.add_argument("--gpu", default="", help="GPU model (empty for CPU/VPS)")
+    add_parser.add_argument("--price", required=True, type=float, help="Price per hour")
+    add_parser.add_argument("--per-month", action="store_true", help="--price is per month")
+
+    # stats コマンド
+    stats_parser = subparsers.add_parser("stats", help="Min/median/trend over a time window")
+    stats_parser.add_argument("--gpu", help="GPU model")
+    stats_parser.add_argument("--provider", help="Provider name")
+    stats_parser.add_argument("--days", type=float, default=DEFAULT_WINDOW_DAYS, help="Window in days")
+
+    # assess コマンド
+    assess_parser = subparsers.add_parser("assess", help="Is this a good price?")
+    assess_parser.add_argument("--gpu", required=True, help="GPU model")
+    assess_parser.add_argument("--price", required=True, type=float, help="Price per hour")
+    assess_parser.add_argument("--provider", help="Provider name")
+    assess_parser.add_argument("--days", type=float, default=DEFAULT_WINDOW_DAYS, help="Window in days")
+
+    args = parser.parse_args()
+    history = PriceHistory()
+
+    if args.command == "add":
+        price = args.price / HOURS_PER_MONTH if args.per_month else args.price
+        added = history.add(args.provider, args.gpu, price)
+        print(json.dumps({"success": True, "added": added, "price_per_hour": price, "observations": len(history)}))
+
+    elif args.command == "stats":
+        print(json.dumps(history.stats(args.gpu, args.provider, args.days), indent=2, ensure_ascii=False))
+
+    elif args.command == "assess":
+        result = history.assess(args.price, args.gpu, args.provider, args.days)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,12 @@ Provision - 環境をプロビジョニング
 Usage:
     python scripts/provision.py --provider docker-local --repo <github-url>
     python scripts/provision.py --provider docker-local --requirements <requirements.json>
+    python scripts/provision.py --provider docker-local --repo <github-url> --pipeline
+    python scripts/provision.py --provider docker-local --repo <github-url> --pipelined
+
+Library:
+    from provision import run_pipeline
+    report = run_pipeline("https://github.com/user/repo", provider="docker-local")
 
 Providers:
     - docker-local: ローカルDocker環境
@@ -12,18 +18,122 @@ Providers:
 """
 
 import sys
+import os
+import re
 import json
+import functools
 import subprocess
 import tempfile
+import threading
+import time
 import uuid
 import argparse
 from pathlib import Path
 from datetime import datetime
 
-
-def provision_docker_local(repo_url: str, requirements: dict) -> dict:
+# 同じディレクトリの analyze_repo / knowledge をライブラリとして読み込めるようにする
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+# これを超えるファイルはビルドコンテキストから除外する（チェックポイント・データセット等）
+LARGE_FILE_THRESHOLD_MB = 50
+
+# リポジトリ情報（topics, description）からGPU要否を推測するキーワード
+GPU_TOPIC_HINTS = [
+    "pytorch", "torch", "tensorflow", "jax", "cuda", "gpu", "deep-learning", "deep learning",
+    "diffusion", "llm", "transformers", "vllm",
+]
+
+# 全言語共通の .dockerignore デフォルト
+COMMON_DOCKERIGNORE = [
+    ".git",
+    ".gitignore",
+    ".github",
+    ".vscode",
+    ".idea",
+    ".DS_Store",
+    "**/.DS_Store",
+    "*.log",
+    ".env",
+    "docker-compose*.yml",
+]
+
+# リポジトリ付属のDockerfileを使う場合の .dockerignore デフォルト。
+# Dockerfileが何を参照するか分からないため（例: setuptools_scm が .git を読む）、
+# ビルドに使われることのないエディタ・OSのファイルだけを除外する
+OWN_DOCKERFILE_DOCKERIGNORE = [
+    ".vscode",
+    ".idea",
+    ".DS_Store",
+    "**/.DS_Store",
+]
+
+# 言語別の .dockerignore デフォルト
+LANGUAGE_DOCKERIGNORE = {
+    "python": [
+        "**/__pycache__",
+        "**/*.py[cod]",
+        ".venv",
+        "venv",
+        ".tox",
+        ".nox",
+        ".pytest_cache",
+        ".mypy_cache",
+        ".ruff_cache",
+        "*.egg-info",
+        "**/.ipynb_checkpoints",
+        "**/*.ipynb",
+    ],
+    "javascript": [
+        "node_modules",
+        "**/node_modules",
+        "npm-debug.log*",
+        ".next",
+        ".nuxt",
+        "coverage",
+        "dist",
+    ],
+    "typescript": [
+        "node_modules",
+        "**/node_modules",
+        "npm-debug.log*",
+        ".next",
+        ".nuxt",
+        "coverage",
+        "dist",
+    ],
+    "go": [
+        "bin",
+        "**/*.test",
+        "coverage.out",
+    ],
+    "rust": [
+        "target",
+    ],
+}
+
+# 学習の成果物・実験ログの置き場になるディレクトリ。
+# ML系リポジトリではコードのパッケージ名でもあるため（例: datasets/__init__.py）、
+# ソースファイルを含まない場合に限り除外する。実行時に読まれることの多い
+# data/ や build/ などの一般的な名前は含めない（大きなファイルは LARGE_FILE_THRESHOLD_MB で扱う）
+LANGUAGE_DATA_DIRS = {
+    "python": {
+        "dirs": ["checkpoints", "datasets", "wandb", "mlruns", "lightning_logs"],
+        "source_suffixes": (".py",),
+    },
+}
+
+# .dockerignore のパターンとして特別な意味を持つ文字
+DOCKERIGNORE_SPECIAL_CHARS = set("*?[]\\")
+
+
+def provision_docker_local(repo_url: str, requirements: dict, checkout: Path | None = None) -> dict:
     """
     ローカルDockerでプロビジョニング
+
+    checkout にクローン済みのディレクトリを渡すとクローンを省略する（パイプライン実行用）。
     """
     result = {
         "provider_name": "docker-local",
@@ -37,15 +147,16 @@ def provision_docker_local(repo_url: str, requirements: dict) -> dict:
     }
 
     try:
+        if checkout is not None:
+            result["setup_steps"].append("Using pre-cloned repository...")
+            result["logs"].append(f"Cloned to {checkout}")
+            return build_and_run(checkout, requirements, result)
+
         # Step 1: リポジトリをクローン
         result["setup_steps"].append("Cloning repository...")
 
         with tempfile.TemporaryDirectory() as tmpdir:
-            clone_result = subprocess.run(
-                ["git", "clone", "--depth", "1", repo_url, tmpdir],
-                capture_output=True,
-                text=True,
-            )
+            clone_result = clone_repo(repo_url, Path(tmpdir))
 
             if clone_result.returncode != 0:
                 result["status"] = "failed"
@@ -53,81 +164,134 @@ def provision_docker_local(repo_url: str, requirements: dict) -> dict:
                 return result
 
             result["logs"].append(f"Cloned to {tmpdir}")
+            return build_and_run(Path(tmpdir), requirements, result)
+
+    except Exception as e:
+        result["status"] = "failed"
+        result["errors"].append(str(e))
 
-            # Step 2: Dockerfileの確認
-            dockerfile_path = Path(tmpdir) / "Dockerfile"
-            has_dockerfile = dockerfile_path.exists()
+    return result
 
-            if has_dockerfile:
-                result["setup_steps"].append("Building from existing Dockerfile...")
-            else:
-                result["setup_steps"].append("Generating Dockerfile...")
-                # 言語に応じたDockerfileを生成
-                dockerfile_content = generate_dockerfile(requirements)
-                dockerfile_path.write_text(dockerfile_content)
-                result["logs"].append("Generated Dockerfile")
-
-            # Step 3: イメージをビルド
-            image_name = f"ap-{requirements.get('repo_name', 'project')}:latest"
-            result["setup_steps"].append(f"Building image: {image_name}")
-
-            build_result = subprocess.run(
-                ["docker", "build", "-t", image_name, tmpdir],
-                capture_output=True,
-                text=True,
-            )
 
-            if build_result.returncode != 0:
-                result["status"] = "failed"
-                result["errors"].append(f"Build failed: {build_result.stderr}")
-                return result
+def clone_repo(repo_url: str, dest: Path) -> subprocess.CompletedProcess:
+    """リポジトリを浅くクローン"""
+    return subprocess.run(
+        ["git", "clone", "--depth", "1", repo_url, str(dest)],
+        capture_output=True,
+        text=True,
+    )
+
+
+def build_and_run(workdir: Path, requirements: dict, result: dict) -> dict:
+    """クローン済みのディレクトリからイメージをビルドしてコンテナを起動"""
+    # Step 2: Dockerfileの確認
+    dockerfile_path = workdir / "Dockerfile"
+    has_dockerfile = dockerfile_path.exists()
 
-            result["image_name"] = image_name
-            result["logs"].append("Image built successfully")
+    if has_dockerfile:
+        result["setup_steps"].append("Building from existing Dockerfile...")
+    else:
+        result["setup_steps"].append("Generating Dockerfile...")
+        # 言語に応じたDockerfileを生成
+        dockerfile_content = generate_dockerfile(requirements)
+        dockerfile_path.write_text(dockerfile_content)
+        result["logs"].append("Generated Dockerfile")
+
+    # Step 3: ビルドコンテキストを削減
+    result["build_context"] = trim_build_context(workdir, requirements, has_dockerfile)
+    if result["build_context"]["dockerignore_generated"]:
+        result["setup_steps"].append("Generated .dockerignore to trim build context")
+        result["logs"].append(
+            "Build context: "
+            f"{format_size(result['build_context']['size_before_bytes'])} -> "
+            f"{format_size(result['build_context']['size_after_bytes'])}"
+        )
+    for large_file in result["build_context"]["large_files_included"]:
+        result["logs"].append(
+            f"Large file kept in build context: {large_file['path']} ({format_size(large_file['size_bytes'])})"
+        )
+
+    # Step 4: イメージをビルド
+    image_name = f"ap-{requirements.get('repo_name', 'project')}:latest"
+    result["setup_steps"].append(f"Building image: {image_name}")
 
-            # Step 4: コンテナを起動
-            result["setup_steps"].append("Starting container...")
+    build_result = subprocess.run(
+        ["docker", "build", "-t", image_name, str(workdir)],
+        capture_output=True,
+        text=True,
+    )
 
-            run_cmd = ["docker", "run", "-d", "--name", result["instance_id"]]
+    if build_result.returncode != 0:
+        result["status"] = "failed"
+        result["errors"].append(f"Build failed: {build_result.stderr}")
+        return result
 
-            # GPU対応
-            if requirements.get("needs_gpu"):
-                run_cmd.extend(["--gpus", "all"])
+    result["image_name"] = image_name
+    result["logs"].append("Image built successfully")
 
-            # ポートマッピング
-            for port in requirements.get("ports", []):
-                run_cmd.extend(["-p", f"{port}:{port}"])
+    # Step 5: コンテナを起動
+    result["setup_steps"].append("Starting container...")
 
-            run_cmd.append(image_name)
+    run_cmd = ["docker", "run", "-d", "--name", result["instance_id"]]
 
-            run_result = subprocess.run(run_cmd, capture_output=True, text=True)
+    # GPU対応
+    if requirements.get("needs_gpu"):
+        run_cmd.extend(["--gpus", "all"])
 
-            if run_result.returncode != 0:
-                result["status"] = "failed"
-                result["errors"].append(f"Run failed: {run_result.stderr}")
-                return result
+    # ポートマッピング
+    for port in requirements.get("ports", []):
+        run_cmd.extend(["-p", f"{port}:{port}"])
 
-            result["container_id"] = run_result.stdout.strip()[:12]
-            result["status"] = "running"
-            result["ready_at"] = datetime.now().isoformat()
-            result["logs"].append(f"Container started: {result['container_id']}")
+    run_cmd.append(image_name)
 
-    except Exception as e:
+    run_result = subprocess.run(run_cmd, capture_output=True, text=True)
+
+    if run_result.returncode != 0:
         result["status"] = "failed"
-        result["errors"].append(str(e))
+        result["errors"].append(f"Run failed: {run_result.stderr}")
+        return result
+
+    result["container_id"] = run_result.stdout.strip()[:12]
+    result["status"] = "running"
+    result["ready_at"] = datetime.now().isoformat()
+    result["logs"].append(f"Container started: {result['container_id']}")
 
     return result
 
 
-def generate_dockerfile(requirements: dict) -> str:
-    """要件に基づいてDockerfileを生成"""
+def select_base_image(requirements: dict) -> str:
+    """生成するDockerfileのベースイメージを選択"""
     language = requirements.get("primary_language", "python")
 
     if language == "python":
-        base_image = "python:3.11-slim"
         if requirements.get("needs_gpu"):
-            base_image = "nvidia/cuda:12.1-runtime-ubuntu22.04"
+            return "nvidia/cuda:12.1-runtime-ubuntu22.04"
+        return "python:3.11-slim"
+    elif language in ["javascript", "typescript"]:
+        return "node:20-slim"
+    elif language == "go":
+        return "golang:1.21-alpine"
+    else:
+        return "ubuntu:22.04"
 
+
+def dockerfile_base_image(dockerfile_path: Path) -> str | None:
+    """既存のDockerfileの最初のFROMからベースイメージを取得"""
+    for line in dockerfile_path.read_text(errors="replace").splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].upper() == "FROM":
+            # "FROM --platform=... image AS name" のオプションを読み飛ばす
+            images = [p for p in parts[1:] if not p.startswith("--")]
+            return images[0] if images else None
+    return None
+
+
+def generate_dockerfile(requirements: dict) -> str:
+    """要件に基づいてDockerfileを生成"""
+    language = requirements.get("primary_language", "python")
+    base_image = select_base_image(requirements)
+
+    if language == "python":
         return f"""FROM {base_image}
 
 WORKDIR /app
@@ -155,7 +319,7 @@ CMD ["python", "{requirements.get('entry_point', 'main.py')}"]
 """
 
     elif language in ["javascript", "typescript"]:
-        return """FROM node:20-slim
+        return f"""FROM {base_image}
 
 WORKDIR /app
 
@@ -168,7 +332,7 @@ CMD ["npm", "start"]
 """
 
     elif language == "go":
-        return """FROM golang:1.21-alpine
+        return f"""FROM {base_image}
 
 WORKDIR /app
 
@@ -182,7 +346,7 @@ CMD ["./main"]
 """
 
     else:
-        return """FROM ubuntu:22.04
+        return f"""FROM {base_image}
 
 WORKDIR /app
 COPY . .
@@ -191,6 +355,250 @@ CMD ["/bin/bash"]
 """
 
 
+def generate_dockerignore(root: Path, requirements: dict, own_dockerfile: bool = False) -> list[str]:
+    """
+    言語別デフォルトと大容量ファイル検出から .dockerignore のパターンを生成
+
+    リポジトリ付属のDockerfileは何をCOPY・参照するか分からないため、
+    エディタ・OSのファイルだけを除外し、大容量ファイルも除外しない。
+    その場合も COPY / ADD が参照するパスに一致するパターンは使わない。
+    """
+    if own_dockerfile:
+        sources = dockerfile_copy_sources(root / "Dockerfile")
+        return [
+            pattern for pattern in OWN_DOCKERFILE_DOCKERIGNORE
+            if not any(is_ignored(source, [pattern]) for source in sources)
+        ]
+
+    language = requirements.get("primary_language", "")
+    patterns = list(COMMON_DOCKERIGNORE)
+    for pattern in LANGUAGE_DOCKERIGNORE.get(language, []):
+        if pattern not in patterns:
+            patterns.append(pattern)
+
+    data_dirs = LANGUAGE_DATA_DIRS.get(language)
+    if data_dirs:
+        for name in data_dirs["dirs"]:
+            path = root / name
+            if path.is_dir() and not path.is_symlink() and not contains_source(path, data_dirs["source_suffixes"]):
+                patterns.append(escape_pattern(name))
+
+    # 依存関係の定義ファイルはDockerfileのCOPYで必要なので除外しない
+    keep = {"requirements.txt", "pyproject.toml", "package.json", "package-lock.json", "go.mod", "go.sum"}
+
+    threshold = LARGE_FILE_THRESHOLD_MB * 1024 * 1024
+    for rel_path, size in iter_context_files(root, patterns):
+        if size > threshold and rel_path not in keep:
+            patterns.append(escape_pattern(rel_path))
+
+    return patterns
+
+
+def dockerfile_copy_sources(dockerfile_path: Path) -> list[str]:
+    """Dockerfile の COPY / ADD が参照するビルドコンテキスト内のパス"""
+    try:
+        text = dockerfile_path.read_text(errors="replace")
+    except OSError:
+        return []
+
+    sources = []
+    # 行継続（末尾の "\"）をつないでから1命令ずつ解釈する
+    for line in re.sub(r"\\\s*\n", " ", text).splitlines():
+        parts = line.strip().split(None, 1)
+        if len(parts) < 2 or parts[0].upper() not in ("COPY", "ADD"):
+            continue
+        # 先頭の --chown などのフラグを取り除く
+        args = parts[1].strip()
+        flags = []
+        while args.startswith("--"):
+            flag, _, args = args.partition(" ")
+            flags.append(flag)
+            args = args.strip()
+        # 他ステージ・イメージからのコピーはコンテキストを参照しない
+        if any(flag.startswith("--from") for flag in flags):
+            continue
+        if args.startswith("["):
+            try:
+                paths = [str(a) for a in json.loads(args)]
+            except json.JSONDecodeError:
+                continue
+        else:
+            paths = args.split()
+        for source in paths[:-1]:
+            if "://" in source or "$" in source:
+                continue
+            source = source.strip("/")
+            while source.startswith("./"):
+                source = source[2:]
+            if source and source != ".":
+                sources.append(source)
+    return sources
+
+
+def contains_source(path: Path, suffixes: tuple[str, ...]) -> bool:
+    """ディレクトリ配下にソースファイルがあるか"""
+    for _, _, filenames in os.walk(path):
+        if any(name.endswith(suffixes) for name in filenames):
+            return True
+    return False
+
+
+def escape_pattern(rel_path: str) -> str:
+    """ファイル名をそのまま一致する .dockerignore のパターンに変換"""
+    escaped = "".join(f"\\{ch}" if ch in DOCKERIGNORE_SPECIAL_CHARS else ch for ch in rel_path)
+    # 先頭の "!"（再包含）と "#"（コメント）もリテラルとして扱わせる
+    if escaped.startswith(("!", "#")):
+        escaped = "\\" + escaped
+    return escaped
+
+
+def iter_context_files(root: Path, patterns: list[str] | None = None):
+    """ビルドコンテキストに含まれるファイルを (相対パス, サイズ) で列挙"""
+    patterns = patterns or []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/")
+
+        # 除外されたディレクトリには降りない
+        dirnames[:] = [
+            d for d in dirnames
+            if not is_ignored(f"{rel_dir}/{d}" if rel_dir else d, patterns)
+        ]
+
+        for name in filenames:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if is_ignored(rel_path, patterns):
+                continue
+            try:
+                size = os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                continue
+            yield rel_path, size
+
+
+def is_ignored(rel_path: str, patterns: list[str]) -> bool:
+    """.dockerignore のパターンに一致するか判定（後勝ち、`!` で再包含）"""
+    ignored = False
+    for pattern in patterns:
+        negate = pattern.startswith("!")
+        if negate:
+            pattern = pattern[1:]
+        pattern = pattern.strip("/")
+        if not pattern:
+            continue
+        if match_pattern(rel_path, pattern):
+            ignored = not negate
+    return ignored
+
+
+def match_pattern(rel_path: str, pattern: str) -> bool:
+    """パスまたはその親ディレクトリがパターンに一致するか"""
+    regex = pattern_regex(pattern)
+    parts = rel_path.split("/")
+    for i in range(1, len(parts) + 1):
+        if regex.fullmatch("/".join(parts[:i])):
+            return True
+    return False
+
+
+@functools.lru_cache(maxsize=1024)
+def pattern_regex(pattern: str) -> re.Pattern:
+    """
+    .dockerignore のパターンを正規表現に変換
+
+    Dockerと同じく `*` `?` `[...]` は "/" をまたがず、`**` だけが任意の階層に一致する。
+    `\\` は次の1文字をリテラルとして扱う。
+    """
+    regex = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "*":
+            if pattern[i + 1:i + 2] == "*":
+                i += 1
+                if pattern[i + 1:i + 2] == "/":
+                    i += 1
+                    regex.append("(?:.*/)?")
+                else:
+                    regex.append(".*")
+            else:
+                regex.append("[^/]*")
+        elif ch == "?":
+            regex.append("[^/]")
+        elif ch == "[":
+            end = pattern.find("]", i + 2 if pattern[i + 1:i + 2] in ("!", "^") else i + 1)
+            if end == -1:
+                regex.append(re.escape(ch))
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                regex.append(f"(?!/)[{body}]")
+                i = end
+        elif ch == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex.append(re.escape(pattern[i]))
+        else:
+            regex.append(re.escape(ch))
+        i += 1
+    return re.compile("".join(regex))
+
+
+def read_dockerignore(path: Path) -> list[str]:
+    """既存の .dockerignore を読み込む"""
+    return [
+        line.strip()
+        for line in path.read_text(errors="replace").splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def context_size(root: Path, patterns: list[str] | None = None) -> int:
+    """ビルドコンテキストの合計サイズ（バイト）"""
+    return sum(size for _, size in iter_context_files(root, patterns))
+
+
+def trim_build_context(root: Path, requirements: dict, own_dockerfile: bool = False) -> dict:
+    """
+    .dockerignore がなければ生成してビルドコンテキストを削減
+
+    既存の .dockerignore はリポジトリの意図を尊重してそのまま使う。
+    """
+    dockerignore_path = root / ".dockerignore"
+    info = {
+        "dockerignore_generated": False,
+        "size_before_bytes": context_size(root),
+        "size_after_bytes": 0,
+        "excluded_patterns": [],
+        "large_files_included": [],
+    }
+
+    if dockerignore_path.exists():
+        patterns = read_dockerignore(dockerignore_path)
+    else:
+        patterns = generate_dockerignore(root, requirements, own_dockerfile)
+        dockerignore_path.write_text("\n".join(patterns) + "\n")
+        info["dockerignore_generated"] = True
+        info["excluded_patterns"] = patterns
+
+    # 除外しなかった大容量ファイル（リポジトリ付属のDockerfileなど）を利用者に示す
+    threshold = LARGE_FILE_THRESHOLD_MB * 1024 * 1024
+    for rel_path, size in iter_context_files(root, patterns):
+        info["size_after_bytes"] += size
+        if size > threshold:
+            info["large_files_included"].append({"path": rel_path, "size_bytes": size})
+    return info
+
+
+def format_size(size: float) -> str:
+    """バイト数を読みやすい単位に変換"""
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
 def terminate_container(instance_id: str) -> dict:
     """コンテナを停止・削除"""
     result = {"success": False, "instance_id": instance_id}
@@ -207,12 +615,312 @@ def terminate_container(instance_id: str) -> dict:
     return result
 
 
+PROVIDERS = {
+    "docker-local": provision_docker_local,
+}
+
+
+def run_pipeline(
+    repo_url: str,
+    provider: str = "docker-local",
+    requirements: dict | None = None,
+    client=None,
+    pipelined: bool = False,
+    reanalyze: bool = False,
+) -> dict:
+    """
+    ナレッジ検索 → 解析 → プロビジョニングを1プロセスで実行
+
+    サブプロセスやJSONの往復を挟まないので、インタープリタの起動は1回で済む。
+    requirements を渡した場合は解析をスキップする。前回の成功記録に要件があれば
+    それを使い、GitHub APIを呼ばない（reanalyze=True で常に解析し直す）。
+    client（httpx.Client）を渡すとGitHub APIの接続を使い回す。
+    pipelined=True（docker-localのみ）では解析・クローン・ベースイメージのpullを並行して行う。
+    """
+    # 依存モジュールは実際に使う時だけ読み込む（起動時間の短縮）
+    from analyze_repo import analyze, normalize_repo_url
+    from knowledge import get_last_success, find_similar
+
+    repo_url = normalize_repo_url(repo_url)
+    report = {
+        "repo_url": repo_url,
+        "provider": provider,
+        "requirements": None,
+        "requirements_source": None,
+        "last_success": None,
+        "similar": [],
+        "result": None,
+    }
+
+    if pipelined and provider == "docker-local":
+        return run_pipelined_docker_local(repo_url, report, requirements, client, reanalyze)
+
+    # Lock: 同じリポジトリの成功記録を先に引き、要件があれば解析を省く
+    report["last_success"] = get_last_success(repo_url)
+
+    if requirements is not None:
+        report["requirements_source"] = "caller"
+    elif not reanalyze and (report["last_success"] or {}).get("requirements"):
+        requirements = dict(report["last_success"]["requirements"])
+        report["requirements_source"] = "last_success"
+    else:
+        requirements = analyze(repo_url, client=client)
+        report["requirements_source"] = "analyze"
+    report["requirements"] = requirements
+
+    # 成功記録がなければ類似セットアップ
+    if report["last_success"] is None:
+        report["similar"] = find_similar(requirements)[:3]
+
+    provision_fn = PROVIDERS.get(provider)
+    if provision_fn is None:
+        report["result"] = {
+            "error": f"Unknown provider: {provider}",
+            "available_providers": list(PROVIDERS),
+        }
+        return report
+
+    report["result"] = provision_fn(repo_url, requirements)
+    return report
+
+
+def predict_requirements(repo_info: dict) -> dict:
+    """最初のAPIレスポンスだけから言語とGPU要否を推測"""
+    text = " ".join([*(repo_info.get("topics") or []), repo_info.get("description") or ""]).lower()
+    return {
+        "primary_language": (repo_info.get("language") or "unknown").lower(),
+        "needs_gpu": any(hint in text for hint in GPU_TOPIC_HINTS),
+    }
+
+
+def timed(timings: dict, stage: str, t0: float, fn, *args):
+    """fn を実行し、t0 からの相対的な開始・終了時刻（秒）を記録"""
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = {
+            "start": round(start - t0, 3),
+            "end": round(time.perf_counter() - t0, 3),
+        }
+
+
+def run_pipelined_docker_local(
+    repo_url: str,
+    report: dict,
+    requirements: dict | None = None,
+    client=None,
+    reanalyze: bool = False,
+) -> dict:
+    """
+    解析・クローン・ベースイメージのpullを重ねて実行
+
+    ベースイメージは、前回の成功記録の要件、または解析の最初のAPIレスポンス
+    （言語・topics）から予測し、解析の完了を待たずにpullを始める。
+    解析が終わった時点で要件（has_dockerfile を含む）から予測を確定し、
+    外れていればpullを中断して正しいイメージのpullをクローンと並行に始める。
+    クローン後にリポジトリのDockerfileを確認し、使われないpullは中断する
+    （戻る時点でpullは必ず終了している）。どれだけ重ねられたかは result["pipeline"] に記録する。
+    """
+    from analyze_repo import analyze
+    from knowledge import get_last_success, find_similar
+
+    t0 = time.perf_counter()
+    timings: dict[str, dict] = {}
+    pipeline = {
+        "predicted_image": None,
+        "prediction_source": None,
+        "pulled_image": None,
+        "pull_returncode": None,
+        "pull_cancelled": False,
+        "actual_base_image": None,
+        "prediction_hit": False,
+        "pull_hit": False,
+        "clone_fallback": False,
+    }
+    # 開始したpull（最後の要素が現在のpull）
+    pulls: list[dict] = []
+    pull_lock = threading.Lock()
+    pull_state = {"stopped": False}
+
+    def pull(entry: dict):
+        with pull_lock:
+            if entry["cancelled"]:
+                return
+            entry["proc"] = subprocess.Popen(
+                ["docker", "pull", entry["image"]], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        entry["returncode"] = entry["proc"].wait()
+
+    def cancel_pull(entry: dict):
+        # pullを中断し、スレッドが終わるまで待つ（完了済みなら何もしない）
+        with pull_lock:
+            entry["cancelled"] = True
+            proc = entry["proc"]
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+                entry["terminated"] = True
+        thread = entry["thread"]
+        if thread.ident is not None:
+            thread.join(timeout=10)
+            if thread.is_alive() and proc is not None:
+                proc.kill()
+                thread.join()
+
+    def start_pull(image: str, source: str):
+        # 同時にpullするのは1イメージだけ。予測が変わったら前のpullを中断する
+        with pull_lock:
+            if pull_state["stopped"] or (pulls and pulls[-1]["image"] == image):
+                return
+            previous = pulls[-1] if pulls else None
+            entry = {
+                "image": image, "source": source, "proc": None,
+                "returncode": None, "cancelled": False, "terminated": False,
+            }
+            entry["thread"] = threading.Thread(target=timed, args=(entry, "timing", t0, pull, entry), daemon=True)
+            pulls.append(entry)
+        if previous is not None:
+            cancel_pull(previous)
+        entry["thread"].start()
+
+    def stop_pull():
+        # 以降のpullを受け付けず、実行中のpullをすべて中断する
+        with pull_lock:
+            pull_state["stopped"] = True
+        for entry in pulls:
+            cancel_pull(entry)
+
+    def settle_prediction(reqs: dict, source: str):
+        # 要件が分かった時点で予測を確定する。既存のDockerfileを使う場合はFROMが
+        # クローンまで分からないので、生成用のイメージのpullは続けない
+        if reqs.get("has_dockerfile"):
+            stop_pull()
+        else:
+            start_pull(select_base_image(reqs), source)
+
+    # Lock: ナレッジはローカルなので先に引き、予測に使う
+    last_success = timed(timings, "knowledge", t0, get_last_success, repo_url)
+    report["last_success"] = last_success
+
+    if requirements is not None:
+        report["requirements_source"] = "caller"
+    elif not reanalyze and (last_success or {}).get("requirements"):
+        requirements = dict(last_success["requirements"])
+        report["requirements_source"] = "last_success"
+
+    if requirements is not None:
+        settle_prediction(requirements, report["requirements_source"])
+    elif last_success and last_success.get("requirements") and not last_success["requirements"].get("has_dockerfile"):
+        start_pull(select_base_image(last_success["requirements"]), "last_success")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkout = Path(tmpdir) / "repo"
+            clone_state: dict = {}
+
+            def clone():
+                clone_state["result"] = clone_repo(repo_url, checkout)
+
+            clone_thread = threading.Thread(target=timed, args=(timings, "clone", t0, clone), daemon=True)
+            clone_thread.start()
+
+            if requirements is None:
+                def on_repo_info(repo_info: dict):
+                    if not pulls:
+                        start_pull(select_base_image(predict_requirements(repo_info)), "repo_info")
+
+                requirements = timed(timings, "analyze", t0, analyze, repo_url, client, on_repo_info)
+                report["requirements_source"] = "analyze"
+                settle_prediction(requirements, "analyze")
+            report["requirements"] = requirements
+
+            if last_success is None:
+                report["similar"] = find_similar(requirements)[:3]
+
+            clone_thread.join()
+
+            # ビルドで実際に使うベースイメージ（既存のDockerfileがあればそのFROM）
+            dockerfile_path = checkout / "Dockerfile"
+            if dockerfile_path.exists():
+                pipeline["actual_base_image"] = dockerfile_base_image(dockerfile_path)
+            else:
+                pipeline["actual_base_image"] = select_base_image(requirements)
+
+            # 現在のpullが使われる場合だけ完了を待ち、それ以外は中断する
+            current = pulls[-1] if pulls and not pulls[-1]["cancelled"] else None
+            if current is not None and current["image"] == pipeline["actual_base_image"]:
+                pipeline["pull_hit"] = True
+                current["thread"].join()
+            stop_pull()
+
+            clone_result = clone_state.get("result")
+            if clone_result is None or clone_result.returncode != 0:
+                # 先行クローンに失敗した場合は通常の手順でやり直す
+                pipeline["clone_fallback"] = True
+                result = provision_docker_local(repo_url, requirements)
+            else:
+                result = timed(timings, "build", t0, provision_docker_local, repo_url, requirements, checkout)
+    finally:
+        # 例外で抜けた場合も含め、pullを孤児プロセスとして残さない
+        stop_pull()
+
+    if pulls:
+        pipeline["predicted_image"] = pulls[0]["image"]
+        pipeline["prediction_source"] = pulls[0]["source"]
+        pipeline["prediction_hit"] = pulls[0]["image"] == pipeline["actual_base_image"]
+        pipeline["pulled_image"] = pulls[-1]["image"]
+        pipeline["pull_returncode"] = pulls[-1]["returncode"]
+        pipeline["pull_cancelled"] = any(entry["terminated"] for entry in pulls)
+        pipeline["pulls"] = [
+            {
+                "image": entry["image"],
+                "source": entry["source"],
+                "returncode": entry["returncode"],
+                "cancelled": entry["terminated"],
+                **entry.get("timing", {}),
+            }
+            for entry in pulls
+        ]
+        if pipeline["pull_hit"] and "timing" in pulls[-1]:
+            timings["pull"] = pulls[-1]["timing"]
+        wasted = [
+            entry["timing"] for entry in pulls
+            if "timing" in entry and not (pipeline["pull_hit"] and entry is pulls[-1])
+        ]
+        if wasted:
+            pipeline["wasted_pull_seconds"] = round(sum(t["end"] - t["start"] for t in wasted), 3)
+
+    # 並行に走らせたステージの合計時間と、実際にかかった時間の差が短縮分
+    # （使われなかったpullは短縮に寄与しないので数えず、無駄になった時間として記録する）
+    overlapped = [dict(timings[name]) for name in ("analyze", "clone", "pull") if name in timings]
+    if overlapped:
+        serial = sum(stage["end"] - stage["start"] for stage in overlapped)
+        span = max(stage["end"] for stage in overlapped) - min(stage["start"] for stage in overlapped)
+        pipeline["serial_seconds"] = round(serial, 3)
+        pipeline["overlapped_span_seconds"] = round(span, 3)
+        pipeline["overlap_saved_seconds"] = round(max(0.0, serial - span), 3)
+
+    pipeline["stages"] = dict(timings)
+    pipeline["wall_seconds"] = round(time.perf_counter() - t0, 3)
+
+    result["pipeline"] = pipeline
+    report["pipelined"] = True
+    report["result"] = result
+    return report
+
+
 def main():
     parser = argparse.ArgumentParser(description="Provision environments")
     parser.add_argument("--provider", default="docker-local", help="Provider to use")
     parser.add_argument("--repo", help="GitHub repository URL")
     parser.add_argument("--requirements", help="Requirements JSON")
     parser.add_argument("--terminate", help="Terminate instance by ID")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Print the full pipeline report (requirements, knowledge lookup, result)")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Overlap analysis, clone and base-image pull (docker-local); implies --pipeline")
+    parser.add_argument("--reanalyze", action="store_true",
+                        help="Analyze the repository even if the knowledge base has its requirements")
 
     args = parser.parse_args()
 
@@ -226,31 +934,48 @@ def main():
         sys.exit(1)
 
     # 要件を読み込み
+    requirements = None
     if args.requirements:
         if args.requirements.startswith("{"):
             requirements = json.loads(args.requirements)
         else:
             requirements = json.loads(Path(args.requirements).read_text())
-    else:
-        # リポジトリURLから要件を取得（analyze_repo を呼び出す）
-        analyze_result = subprocess.run(
-            ["python", str(Path(__file__).parent / "analyze_repo.py"), args.repo],
-            capture_output=True,
-            text=True,
-        )
-        if analyze_result.returncode != 0:
-            print(json.dumps({"error": "Failed to analyze repo", "details": analyze_result.stderr}))
-            sys.exit(1)
-        requirements = json.loads(analyze_result.stdout)
 
     repo_url = args.repo or requirements.get("repo_url", "")
 
-    if args.provider == "docker-local":
-        result = provision_docker_local(repo_url, requirements)
+    # 不正なURLはどの経路でも同じエラーで終了する
+    from analyze_repo import normalize_repo_url, parse_github_url
+    repo_url = normalize_repo_url(repo_url)
+    try:
+        parse_github_url(repo_url)
+    except ValueError as e:
+        print(json.dumps({"error": "Failed to analyze repo", "details": str(e)}))
+        sys.exit(1)
+
+    if args.pipeline or args.pipelined:
+        report = run_pipeline(
+            repo_url, provider=args.provider, requirements=requirements,
+            pipelined=args.pipelined, reanalyze=args.reanalyze,
+        )
+        print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+        return
+
+    if requirements is None:
+        # リポジトリURLから要件を取得（同じプロセス内で analyze_repo を呼び出す）
+        from analyze_repo import analyze
+        try:
+            requirements = analyze(repo_url)
+        except Exception as e:
+            print(json.dumps({"error": "Failed to analyze repo", "details": str(e)}))
+            sys.exit(1)
+
+    provision_fn = PROVIDERS.get(args.provider)
+    if provision_fn is not None:
+        result = provision_fn(repo_url, requirements)
     else:
         result = {
             "error": f"Unknown provider: {args.provider}",
-            "available_providers": ["docker-local"],
+            "available_providers": list(PROVIDERS),
         }
 
     print(json.dumps(result, indent=2, ensure_ascii=False))
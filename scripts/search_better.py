@@ -5,6 +5,9 @@ Search Better - ウェブ検索で改善候補を発見
 Usage:
     python scripts/search_better.py --requirements <requirements.json>
     python scripts/search_better.py --query "gpu cloud pricing 2026"
+    python scripts/search_better.py --analyze-results <results.ndjson> [--current-record <record.json>]
+    cat results.ndjson | python scripts/search_better.py --analyze-results -
+    python scripts/search_better.py --cache-results <results.ndjson> --query "<query>" --purpose <purpose>
 
 Note:
     このスクリプトはエージェントがWebSearch/WebFetchツールを使う際の
@@ -13,8 +16,33 @@ Note:
 
 import sys
 import json
+import heapq
 import argparse
+from collections.abc import Iterable, Iterator
 from datetime import datetime
+from pathlib import Path
+from typing import TextIO
+
+from price_history import HOURS_PER_MONTH, PriceHistory, parse_price
+
+
+# 検索結果キャッシュの保存先（ナレッジベースと同じディレクトリ）
+SEARCH_CACHE_FILE = Path(__file__).parent.parent / "assets" / "knowledge" / "search_cache.json"
+
+# 目的ごとのキャッシュ有効期間（時間）。価格は日単位、ツールや手法は週〜月単位で変わる
+SEARCH_CACHE_TTL_HOURS = {
+    "cost_reduction": 24,
+    "specific_gpu_pricing": 24,
+    "provider_comparison": 24 * 7,
+    "framework_deployment": 24 * 14,
+    "tool_improvement": 24 * 30,
+    "best_practices": 24 * 30,
+    "custom": 24,
+}
+DEFAULT_SEARCH_CACHE_TTL_HOURS = 24
+
+# 返す改善候補の最大数
+DEFAULT_TOP_K = 20
 
 
 def generate_search_queries(requirements: dict) -> list[dict]:
@@ -87,58 +115,260 @@ def generate_search_queries(requirements: dict) -> list[dict]:
     return queries
 
 
-def analyze_search_results(results: list[dict], current_record: dict | None) -> list[dict]:
+def normalize_query(query: str) -> str:
+    """大文字小文字・空白の違いを吸収したクエリ"""
+    return " ".join(query.lower().split())
+
+
+def cache_key(query: str, purpose: str) -> str:
+    """キャッシュのキー（目的 + 正規化クエリ）"""
+    return f"{purpose}:{normalize_query(query)}"
+
+
+def load_search_cache() -> dict:
+    """検索結果キャッシュを読み込む"""
+    if not SEARCH_CACHE_FILE.exists():
+        return {"entries": {}}
+    try:
+        cache = json.loads(SEARCH_CACHE_FILE.read_text())
+    except json.JSONDecodeError:
+        return {"entries": {}}
+    # 壊れたファイルは空のキャッシュとして扱う
+    if not isinstance(cache, dict) or not isinstance(cache.get("entries"), dict):
+        return {"entries": {}}
+    return cache
+
+
+def save_search_cache(cache: dict):
+    """検索結果キャッシュを保存"""
+    SEARCH_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    SEARCH_CACHE_FILE.write_text(json.dumps(cache, indent=2, ensure_ascii=False, default=str))
+
+
+def get_cached_results(cache: dict, query: str, purpose: str, now: datetime | None = None) -> dict | None:
+    """有効期間内のキャッシュがあれば返す。壊れたエントリは期限切れとみなす"""
+    entries = cache.get("entries")
+    if not isinstance(entries, dict):
+        return None
+    entry = entries.get(cache_key(query, purpose))
+    if not isinstance(entry, dict) or not isinstance(entry.get("results"), list):
+        return None
+
+    now = naive_local(now or datetime.now())
+    try:
+        age_hours = (now - naive_local(datetime.fromisoformat(entry["cached_at"]))).total_seconds() / 3600
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return None
+
+    # 未来の時刻（時計のずれ・手編集）も期限切れとみなす
+    ttl_hours = SEARCH_CACHE_TTL_HOURS.get(purpose, DEFAULT_SEARCH_CACHE_TTL_HOURS)
+    if age_hours < 0 or age_hours > ttl_hours:
+        return None
+    return entry
+
+
+def naive_local(value: datetime) -> datetime:
+    """タイムゾーン付きの時刻をローカル時刻（タイムゾーンなし）にそろえる"""
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def store_search_results(query: str, purpose: str, results: list[dict]) -> str:
+    """エージェントが抽出した検索結果をキャッシュに保存"""
+    cache = load_search_cache()
+    key = cache_key(query, purpose)
+    cache["entries"][key] = {
+        "query": query,
+        "purpose": purpose,
+        "cached_at": datetime.now().isoformat(),
+        "results": results,
+    }
+    save_search_cache(cache)
+    return key
+
+
+def split_cached_queries(queries: list[dict]) -> tuple[list[dict], list[dict]]:
+    """クエリをキャッシュ済み（有効）と要検索に分ける"""
+    cache = load_search_cache()
+    now = datetime.now()
+    cached, stale = [], []
+
+    for query in queries:
+        entry = get_cached_results(cache, query["query"], query["purpose"], now)
+        if entry is None:
+            stale.append(query)
+        else:
+            cached.append({**query, "cached_at": entry["cached_at"], "results": entry["results"]})
+
+    return cached, stale
+
+
+def iter_ndjson(stream: TextIO) -> Iterator[dict]:
+    """NDJSON（1行1オブジェクト）を1行ずつ読み込む。壊れた行は読み飛ばす"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(row, dict):
+            yield row
+
+
+def normalize_price(result: dict) -> float | None:
+    """時間単価（$/hour）に正規化。月額しかない場合は換算する"""
+    price = parse_price(result.get("price_per_hour"))
+    if price is not None:
+        return price
+    price = parse_price(result.get("price_per_month"))
+    if price is not None:
+        return price / HOURS_PER_MONTH
+    return None
+
+
+def offer_key(result: dict) -> tuple[str, str]:
+    """重複排除のキー（プロバイダー, GPU）"""
+    provider = str(result.get("provider_name") or "").strip().lower()
+    gpu = str(result.get("gpu_type") or result.get("gpu") or "").strip().lower()
+    return provider, gpu
+
+
+def analyze_search_results(
+    results: Iterable[dict],
+    current_record: dict | None,
+    top_k: int = DEFAULT_TOP_K,
+    price_history=None,
+) -> list[dict]:
     """
     検索結果を分析して改善候補を生成
 
     この関数はエージェントが検索結果を取得した後に呼び出され、
     過去の記録と比較して改善候補を提案する。
+    results はイテレータでもよく、(プロバイダー, GPU) ごとに最安のオファーだけを
+    保持し、上位 top_k 件をヒープで選ぶため、行数に依存しないメモリで動作する。
+    price_history（price_history.PriceHistory）を渡すと、コスト削減候補に
+    今回の実行より前の相場との比較を付け、その後で最良オファーを価格履歴に記録する。
     """
-    improvements = []
-
     current_cost = current_record.get("estimated_cost", float("inf")) if current_record else float("inf")
-    current_provider = current_record.get("provider_used", "") if current_record else ""
+    # offer_key と同じ正規化で比較する（"Runpod" と "runpod" は同じプロバイダー）
+    current_provider = str(current_record.get("provider_used") or "").strip().lower() if current_record else ""
+
+    # (プロバイダー, GPU) ごとの最良オファー
+    best_offers: dict[tuple[str, str], tuple[float, dict]] = {}
+    # ツール名ごとの最初の推薦
+    tools: dict[str, dict] = {}
 
     for result in results:
+        provider = result.get("provider_name", "")
+        if provider:
+            price = normalize_price(result)
+            key = offer_key(result)
+            best = best_offers.get(key)
+            rank = price if price is not None else float("inf")
+            if best is None or rank < best[0]:
+                best_offers[key] = (rank, result)
+
+        if result.get("purpose") == "tool_improvement":
+            tool_name = str(result.get("tool_name") or "Unknown")
+            tools.setdefault(tool_name.lower(), result)
+
+    if top_k < 1:
+        record_offers(price_history, best_offers)
+        return []
+
+    heap: list[tuple[int, float, int, dict]] = []
+    counter = 0
+
+    def push(improvement: dict, price: float = float("inf")):
+        # 優先度が同じなら安い方を残す
+        nonlocal counter
+        counter += 1
+        entry = (improvement.get("priority", 0), -price, -counter, improvement)
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    for price, result in best_offers.values():
+        provider = result.get("provider_name", "")
+        gpu = result.get("gpu_type") or result.get("gpu") or ""
+        label = f"{provider} ({gpu})" if gpu else provider
+
         # コスト比較
-        if "price_per_hour" in result:
-            price = result["price_per_hour"]
-            if price < current_cost * 0.7:  # 30%以上安い
-                savings = (1 - price / current_cost) * 100 if current_cost != float("inf") else 0
-                improvements.append({
-                    "type": "cost_reduction",
-                    "title": f"Cheaper provider: {result.get('provider_name', 'Unknown')}",
-                    "description": f"Found {savings:.0f}% cheaper option",
-                    "current_value": f"${current_cost:.4f}/hour",
-                    "suggested_value": f"${price:.4f}/hour",
-                    "source": result.get("source_url", ""),
-                    "priority": 70 if savings > 30 else 50,
-                })
+        if price != float("inf") and price < current_cost * 0.7:  # 30%以上安い
+            savings = (1 - price / current_cost) * 100 if current_cost != float("inf") else 0
+            improvement = {
+                "type": "cost_reduction",
+                "title": f"Cheaper provider: {label}",
+                "description": f"Found {savings:.0f}% cheaper option",
+                "current_value": f"${current_cost:.4f}/hour",
+                "suggested_value": f"${price:.4f}/hour",
+                "source": result.get("source_url", ""),
+                "priority": 70 if savings > 30 else 50,
+            }
+            if price_history is not None and gpu:
+                assessment = price_history.assess(price, gpu)
+                improvement["price_assessment"] = {
+                    "verdict": assessment["verdict"],
+                    "percentile": assessment["percentile"],
+                    "median": assessment["stats"]["median"],
+                    "min": assessment["stats"]["min"],
+                    "trend": assessment["stats"]["trend"],
+                }
+            push(improvement, price)
 
         # 新しいプロバイダー
-        provider = result.get("provider_name", "")
-        if provider and provider != current_provider:
-            improvements.append({
+        if offer_key(result)[0] != current_provider:
+            push({
                 "type": "alternative_provider",
-                "title": f"Alternative: {provider}",
+                "title": f"Alternative: {label}",
                 "description": result.get("description", ""),
                 "source": result.get("source_url", ""),
                 "priority": 40,
-            })
+            }, price)
+
+    # ツール改善
+    for result in tools.values():
+        push({
+            "type": "tool_upgrade",
+            "title": f"Recommended tool: {result.get('tool_name', 'Unknown')}",
+            "description": result.get("advantages", ""),
+            "priority": 60,
+        })
 
-        # ツール改善
-        if result.get("purpose") == "tool_improvement":
-            improvements.append({
-                "type": "tool_upgrade",
-                "title": f"Recommended tool: {result.get('tool_name', 'Unknown')}",
-                "description": result.get("advantages", ""),
-                "priority": 60,
-            })
+    # 相場の判定が終わってから今回の観測を記録する
+    record_offers(price_history, best_offers)
 
     # 優先度でソート
-    improvements.sort(key=lambda x: x.get("priority", 0), reverse=True)
-
-    return improvements
+    return [entry[3] for entry in sorted(heap, reverse=True)]
+
+
+def record_offers(price_history, best_offers: dict[tuple[str, str], tuple[float, dict]]) -> int:
+    """最良オファーを価格履歴に記録（出典・日付が同じ観測は price_history 側で除外）"""
+    if price_history is None:
+        return 0
+    return price_history.add_many(
+        (
+            result.get("provider_name", ""),
+            result.get("gpu_type") or result.get("gpu") or "",
+            price,
+            None,
+            result.get("source_url", ""),
+        )
+        for price, result in best_offers.values()
+        if price != float("inf")
+    )
+
+
+def positive_int(value: str) -> int:
+    """1以上の整数（argparse用）"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1: {value}")
+    return number
 
 
 def main():
@@ -146,41 +376,110 @@ def main():
     parser.add_argument("--requirements", help="Requirements JSON file or inline JSON")
     parser.add_argument("--query", help="Direct search query")
     parser.add_argument("--current-record", help="Current record JSON for comparison")
+    parser.add_argument("--analyze-results", help="NDJSON file of extracted search results ('-' for stdin)")
+    parser.add_argument("--top-k", type=positive_int, default=DEFAULT_TOP_K, help="Maximum number of improvements")
+    parser.add_argument("--cache-results", help="NDJSON file of extracted results to cache for --query ('-' for stdin)")
+    parser.add_argument("--purpose", default="custom", help="Purpose of --query (used as part of the cache key)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached search results")
+    parser.add_argument("--no-price-history", action="store_true",
+                        help="Do not record offers in, or compare them against, the price history")
 
     args = parser.parse_args()
 
-    if args.requirements:
+    if args.cache_results:
+        if not args.query:
+            parser.error("--cache-results requires --query")
+
+        if args.cache_results == "-":
+            results = list(iter_ndjson(sys.stdin))
+        else:
+            with open(args.cache_results, encoding="utf-8") as f:
+                results = list(iter_ndjson(f))
+
+        key = store_search_results(args.query, args.purpose, results)
+        print(json.dumps({"success": True, "cache_key": key, "results": len(results)}, ensure_ascii=False))
+
+    elif args.analyze_results:
+        current_record = None
+        if args.current_record:
+            if args.current_record.startswith("{"):
+                current_record = json.loads(args.current_record)
+            else:
+                current_record = json.loads(Path(args.current_record).read_text())
+
+        price_history = None
+        if not args.no_price_history:
+            price_history = PriceHistory()
+
+        if args.analyze_results == "-":
+            improvements = analyze_search_results(iter_ndjson(sys.stdin), current_record, args.top_k, price_history)
+        else:
+            with open(args.analyze_results, encoding="utf-8") as f:
+                improvements = analyze_search_results(iter_ndjson(f), current_record, args.top_k, price_history)
+
+        output = {
+            "action": "improvements_found" if improvements else "no_improvements",
+            "improvements": improvements,
+        }
+        print(json.dumps(output, indent=2, ensure_ascii=False))
+
+    elif args.requirements:
         # 要件からクエリを生成
         if args.requirements.startswith("{"):
             requirements = json.loads(args.requirements)
         else:
-            from pathlib import Path
             requirements = json.loads(Path(args.requirements).read_text())
 
         queries = generate_search_queries(requirements)
 
+        # 有効期間内の検索結果は再検索しない
+        if args.no_cache:
+            cached, stale = [], queries
+        else:
+            cached, stale = split_cached_queries(queries)
+
         output = {
-            "action": "web_search_required",
-            "queries": queries,
-            "instructions": """
+            "action": "web_search_required" if stale else "cached",
+            "queries": stale,
+            "cached_results": cached,
+        }
+        if stale:
+            output["instructions"] = """
 エージェントは以下の手順で検索を実行してください:
 
-1. 各クエリでWebSearchツールを使用
+1. queries の各クエリでWebSearchツールを使用（cached_results は検索不要）
 2. 結果からextractフィールドの情報を抽出
-3. 抽出した情報をこのスクリプトに戻して分析:
-   python scripts/search_better.py --analyze-results <results.json>
+3. 抽出した情報をNDJSON（1行1件）でクエリごとにキャッシュ:
+   python scripts/search_better.py --cache-results <results.ndjson> --query "<query>" --purpose <purpose>
+4. キャッシュ済みの結果と合わせてこのスクリプトに戻して分析:
+   python scripts/search_better.py --analyze-results <results.ndjson>
 
 または、エージェントが直接結果を解析して改善候補を判断することも可能です。
-""",
-        }
+"""
         print(json.dumps(output, indent=2, ensure_ascii=False))
 
     elif args.query:
         # 直接クエリの場合
-        output = {
-            "action": "web_search_required",
-            "queries": [{"query": args.query, "purpose": "custom"}],
-        }
+        entry = None
+        if not args.no_cache:
+            entry = get_cached_results(load_search_cache(), args.query, args.purpose)
+
+        if entry is None:
+            output = {
+                "action": "web_search_required",
+                "queries": [{"query": args.query, "purpose": args.purpose}],
+            }
+        else:
+            output = {
+                "action": "cached",
+                "queries": [],
+                "cached_results": [{
+                    "query": args.query,
+                    "purpose": args.purpose,
+                    "cached_at": entry["cached_at"],
+                    "results": entry["results"],
+                }],
+            }
         print(json.dumps(output, indent=2, ensure_ascii=False))
 
     else:
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Provisioning Service - 常駐プロセスとしてプロビジョニングを受け付ける
+
+Usage:
+    python scripts/server.py                      # http://127.0.0.1:8765
+    python scripts/server.py --port 9000 --workers 4 --queue-size 32
+    python scripts/server.py --socket /tmp/agentic-provisioning.sock
+
+API:
+    GET  /health                         稼働確認
+    GET  /metrics                        ジョブ数・キュー長・処理時間など
+    POST /jobs                           {"repo_url": ..., "provider": "docker-local", "requirements": {...}, "pipelined": true}
+    GET  /jobs                           ジョブ一覧
+    GET  /jobs/<job_id>                  ジョブの状態と結果
+    POST /analyze                        {"repo_url": ...} → 要件（同期）
+    GET  /knowledge/last-success?repo_url=<url>
+    POST /knowledge/similar              {"requirements": {...}}
+    GET  /knowledge/records
+
+Example:
+    curl -s -X POST localhost:8765/jobs -H 'Content-Type: application/json' \
+        -d '{"repo_url": "https://github.com/user/repo"}'
+    curl -s --unix-socket /tmp/agentic-provisioning.sock http://localhost/metrics
+
+Note:
+    CLIの呼び出しごとに発生するインタープリタ起動・index.jsonの再読み込み・
+    httpx.Clientの生成を避けるため、これらをプロセス内に保持する。
+    ナレッジベースはメモリに保持しつつ、書き込みはファイルにも即時反映する。
+
+Security:
+    認証は持たないため、ローカルからの呼び出しだけを受け付ける。
+    - POST は Content-Type: application/json のみ（ブラウザからは必ずCORSプリフライトになる）
+    - Host / Origin がローカル（localhost, 127.0.0.1, ::1 と --host の値）以外なら 403
+      （他サイトからのリクエストやDNSリバインディングを拒否する）
+    - unixソケット（--socket）はファイル権限 0600 で本人だけが接続できる
+"""
+
+import os
+import sys
+import json
+import uuid
+import queue
+import signal
+import socketserver
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import knowledge
+from provision import PROVIDERS, run_pipeline
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 16
+
+# 完了したジョブを保持する件数（古いものから破棄）
+MAX_FINISHED_JOBS = 1000
+
+# Host / Origin として受け付けるホスト名
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+class ProvisioningService:
+    """ジョブキュー・ワーカー・共有リソース（HTTP接続プール、ナレッジ）を保持"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.started_at = time.time()
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.jobs: OrderedDict[str, dict] = OrderedDict()
+        self.lock = threading.Lock()
+        self.metrics = {
+            "jobs_submitted": 0,
+            "jobs_rejected": 0,
+            "jobs_succeeded": 0,
+            "jobs_failed": 0,
+            "job_seconds_total": 0.0,
+            "analyze_requests": 0,
+        }
+        self._client = None
+        self._client_lock = threading.Lock()
+
+        knowledge.enable_cache()
+        knowledge.load_index()
+
+        self.workers = [
+            threading.Thread(target=self._worker, name=f"provision-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    @property
+    def client(self):
+        """GitHub API用の共有httpx.Client（初回使用時に生成）"""
+        with self._client_lock:
+            if self._client is None:
+                import httpx
+                self._client = httpx.Client(
+                    timeout=30.0,
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                )
+            return self._client
+
+    def close(self):
+        """共有リソースを解放"""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def submit(
+        self,
+        repo_url: str,
+        provider: str,
+        requirements: dict | None,
+        pipelined: bool = False,
+    ) -> dict | None:
+        """ジョブをキューに追加。キューが満杯なら None"""
+        job = {
+            "id": f"job-{uuid.uuid4().hex[:12]}",
+            "repo_url": repo_url,
+            "provider": provider,
+            "pipelined": pipelined,
+            "status": "queued",
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "report": None,
+            "error": None,
+        }
+        try:
+            self.queue.put_nowait((job, requirements))
+        except queue.Full:
+            with self.lock:
+                self.metrics["jobs_rejected"] += 1
+            return None
+
+        with self.lock:
+            self.jobs[job["id"]] = job
+            self.metrics["jobs_submitted"] += 1
+            self._trim_jobs()
+        return job
+
+    def _trim_jobs(self):
+        """完了済みジョブを古い順に破棄して上限内に収める"""
+        finished = [jid for jid, j in self.jobs.items() if j["status"] in ("succeeded", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _worker(self):
+        """キューからジョブを取り出して実行"""
+        while True:
+            job, requirements = self.queue.get()
+            started = time.time()
+            job["status"] = "running"
+            job["started_at"] = datetime.now().isoformat()
+            try:
+                client = self.client if requirements is None else None
+                report = run_pipeline(
+                    job["repo_url"], job["provider"], requirements,
+                    client=client, pipelined=job["pipelined"],
+                )
+                result = report.get("result") or {}
+                job["report"] = report
+                job["status"] = "failed" if result.get("error") or result.get("status") == "failed" else "succeeded"
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                job["finished_at"] = datetime.now().isoformat()
+                with self.lock:
+                    self.metrics["job_seconds_total"] += time.time() - started
+                    self.metrics["jobs_succeeded" if job["status"] == "succeeded" else "jobs_failed"] += 1
+                self.queue.task_done()
+
+    def get_job(self, job_id: str) -> dict | None:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> list[dict]:
+        """ジョブ一覧（結果本体は除く）"""
+        with self.lock:
+            return [
+                {k: v for k, v in job.items() if k != "report"}
+                for job in self.jobs.values()
+            ]
+
+    def analyze(self, repo_url: str) -> dict:
+        """共有クライアントでリポジトリを解析"""
+        from analyze_repo import analyze, normalize_repo_url
+        with self.lock:
+            self.metrics["analyze_requests"] += 1
+        return analyze(normalize_repo_url(repo_url), client=self.client)
+
+    def snapshot_metrics(self) -> dict:
+        """メトリクスのスナップショット"""
+        with self.lock:
+            metrics = dict(self.metrics)
+            statuses = [job["status"] for job in self.jobs.values()]
+        finished = metrics["jobs_succeeded"] + metrics["jobs_failed"]
+        metrics.update({
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "workers": len(self.workers),
+            "jobs_running": statuses.count("running"),
+            "job_seconds_avg": round(metrics["job_seconds_total"] / finished, 3) if finished else None,
+            "knowledge_records": len(knowledge.load_index()["records"]),
+        })
+        metrics["job_seconds_total"] = round(metrics["job_seconds_total"], 3)
+        return metrics
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON APIのリクエストハンドラ"""
+
+    server_version = "AgenticProvisioning/0.3"
+
+    @property
+    def service(self) -> ProvisioningService:
+        return self.server.service
+
+    def do_GET(self):
+        self._dispatch(self._handle_get)
+
+    def do_POST(self):
+        self._dispatch(self._handle_post)
+
+    def _dispatch(self, handler):
+        """想定外の例外でも接続を切らずに 500 を返す"""
+        try:
+            if self._check_origin():
+                handler()
+        except Exception as e:
+            self.log_error("Unhandled error: %r", e)
+            try:
+                self._send(500, {"error": "Internal server error", "details": str(e)})
+            except OSError:
+                pass
+
+    def _handle_get(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/") or "/"
+
+        if path == "/health":
+            self._send(200, {"status": "ok"})
+        elif path == "/metrics":
+            self._send(200, self.service.snapshot_metrics())
+        elif path == "/jobs":
+            self._send(200, self.service.list_jobs())
+        elif path.startswith("/jobs/"):
+            job = self.service.get_job(path[len("/jobs/"):])
+            if job is None:
+                self._send(404, {"error": "Job not found"})
+            else:
+                self._send(200, job)
+        elif path == "/knowledge/last-success":
+            repo_url = parse_qs(url.query).get("repo_url", [""])[0]
+            if not repo_url:
+                self._send(400, {"error": "repo_url is required"})
+                return
+            record = knowledge.get_last_success(repo_url)
+            self._send(200, record or {"found": False, "message": "No successful record found"})
+        elif path == "/knowledge/records":
+            self._send(200, knowledge.list_records())
+        else:
+            self._send(404, {"error": f"Unknown path: {path}"})
+
+    def _handle_post(self):
+        path = urlparse(self.path).path.rstrip("/")
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._send(415, {"error": "Content-Type must be application/json"})
+            return
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+
+        if path == "/jobs":
+            requirements = body.get("requirements")
+            if requirements is not None and not isinstance(requirements, dict):
+                self._send(400, {"error": "requirements must be a JSON object"})
+                return
+            repo_url = body.get("repo_url") or (requirements or {}).get("repo_url")
+            provider = body.get("provider", "docker-local")
+            if not self._check_repo_url(repo_url):
+                return
+            if not isinstance(provider, str) or provider not in PROVIDERS:
+                self._send(400, {"error": f"Unknown provider: {provider}", "available_providers": list(PROVIDERS)})
+                return
+            try:
+                validate_repo_url(repo_url)
+            except ValueError as e:
+                self._send(400, {"error": "Invalid repo_url", "details": str(e)})
+                return
+            job = self.service.submit(repo_url, provider, requirements, bool(body.get("pipelined")))
+            if job is None:
+                self._send(429, {"error": "Job queue is full", "queue_size": self.service.queue.maxsize})
+            else:
+                self._send(202, {"job_id": job["id"], "status": job["status"]})
+        elif path == "/analyze":
+            if not self._check_repo_url(body.get("repo_url")):
+                return
+            try:
+                requirements = self.service.analyze(body["repo_url"])
+            except ValueError as e:
+                self._send(400, {"error": "Failed to analyze repo", "details": str(e)})
+                return
+            self._send(200, requirements)
+        elif path == "/knowledge/similar":
+            requirements = body.get("requirements", body)
+            if not isinstance(requirements, dict):
+                self._send(400, {"error": "requirements must be a JSON object"})
+                return
+            self._send(200, knowledge.find_similar(requirements))
+        else:
+            self._send(404, {"error": f"Unknown path: {path}"})
+
+    def _check_repo_url(self, repo_url) -> bool:
+        """repo_url が空でない文字列でなければ 400 を返して False"""
+        if not repo_url:
+            self._send(400, {"error": "repo_url is required"})
+            return False
+        if not isinstance(repo_url, str):
+            self._send(400, {"error": "repo_url must be a string"})
+            return False
+        return True
+
+    def _check_origin(self) -> bool:
+        """Host / Origin がローカルでなければ 403 を返して False"""
+        allowed = self.server.allowed_hosts
+        host = self.headers.get("Host")
+        if host is not None and header_hostname(host) not in allowed:
+            self._send(403, {"error": f"Host not allowed: {host}"})
+            return False
+        origin = self.headers.get("Origin")
+        if origin is not None and header_hostname(origin, is_origin=True) not in allowed:
+            self._send(403, {"error": f"Origin not allowed: {origin}"})
+            return False
+        return True
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise ValueError("JSON object expected")
+        return body
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload, indent=2, ensure_ascii=False, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def header_hostname(value: str, is_origin: bool = False) -> str | None:
+    """Host（"localhost:8765", "[::1]:8765"）や Origin（"http://localhost:3000"）からホスト名を取り出す"""
+    try:
+        return urlparse(value if is_origin else f"//{value}").hostname
+    except ValueError:
+        return None
+
+
+def validate_repo_url(repo_url: str):
+    """GitHub URLとして解釈できなければ ValueError"""
+    from analyze_repo import normalize_repo_url, parse_github_url
+    parse_github_url(normalize_repo_url(repo_url))
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    """unixソケット上のHTTPサーバー"""
+
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler はタプルのアドレスを前提にしている
+        return request, ("unix", 0)
+
+
+def create_server(service: ProvisioningService, host: str, port: int, socket_path: str | None = None):
+    """TCPまたはunixソケットのサーバーを生成"""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, ServiceHandler)
+        os.chmod(socket_path, 0o600)
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.service = service
+    # 明示的にバインドしたアドレスは Host として受け付ける（0.0.0.0 などのワイルドカードは除く）
+    server.allowed_hosts = set(LOCAL_HOSTS)
+    if not socket_path and host not in ("", "0.0.0.0", "::"):
+        server.allowed_hosts.add(host.lower())
+    return server
+
+
+def positive_int(value: str) -> int:
+    """1以上の整数（argparse用）。Queue(maxsize=0) は無制限になるため 0 は受け付けない"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1: {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running provisioning service")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Bind address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Bind port")
+    parser.add_argument("--socket", help="Listen on a unix socket instead of TCP")
+    parser.add_argument("--workers", type=positive_int, default=DEFAULT_WORKERS, help="Concurrent provisioning jobs")
+    parser.add_argument("--queue-size", type=positive_int, default=DEFAULT_QUEUE_SIZE, help="Maximum queued jobs")
+
+    args = parser.parse_args()
+
+    service = ProvisioningService(workers=args.workers, queue_size=args.queue_size)
+    server = create_server(service, args.host, args.port, args.socket)
+    address = args.socket or f"http://{args.host}:{args.port}"
+    print(json.dumps({"status": "listening", "address": address}), flush=True)
+
+    # SIGTERM でもソケットファイルを片付けてから終了する
+    def handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()